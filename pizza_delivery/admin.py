@@ -1,14 +1,109 @@
-from django.contrib import admin
+import re
+from decimal import Decimal
+
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Lower
+from django.utils import timezone
 
+from pizza_delivery.forms import OrderAdminForm
 from pizza_delivery.models import (
+    ArchivedDishOrder,
+    ArchivedOrder,
     Customer,
     Order,
     DishOrder,
     Dish,
     Ingredient,
     DishIngredient,
+    OrderStatusChange,
 )
+from pizza_delivery.pagination import EstimatedCountPaginator
+
+PHONE_SEARCH = re.compile(r"^\+?[0-9\s()-]+$")
+# Bare digit terms are order ids, long enough ones may be phone numbers
+# typed without the leading "+" as well
+MIN_PHONE_DIGITS = 7
+MAX_ID_DIGITS = 18
+
+
+class ProbedDatesChangeList(ChangeList):
+    """
+    Changelist whose date hierarchy, see ``probed_date_hierarchy``, is
+    built from indexed range probes: two index seeks for the first and
+    last date and one EXISTS per candidate year, month or day, instead
+    of MIN/MAX and truncating and de-duplicating every row of the table.
+    """
+
+    def date_bounds(self) -> tuple:
+        return self._edge_value(), self._edge_value(last=True)
+
+    def date_periods(self, kind: str) -> list:
+        field_name = self.date_hierarchy
+        first, last = self.date_bounds()
+        if first is None:
+            return []
+        dates = self.queryset.filter(**{f"{field_name}__isnull": False})
+
+        start = period_start(timezone.localtime(first), kind)
+        periods = []
+        while start <= last:
+            end = next_period_start(start, kind)
+            if dates.filter(
+                **{f"{field_name}__gte": start, f"{field_name}__lt": end}
+            ).exists():
+                periods.append(start)
+            start = end
+        return periods
+
+    def _edge_value(self, last: bool = False):
+        field_name = self.date_hierarchy
+        return (
+            self.queryset.filter(**{f"{field_name}__isnull": False})
+            .order_by(f"-{field_name}" if last else field_name)
+            .values_list(field_name, flat=True)
+            .first()
+        )
+
+
+def period_start(moment, kind: str):
+    naive = moment.replace(
+        tzinfo=None, hour=0, minute=0, second=0, microsecond=0
+    )
+    if kind in ("year", "month"):
+        naive = naive.replace(day=1)
+    if kind == "year":
+        naive = naive.replace(month=1)
+    return timezone.make_aware(naive, moment.tzinfo)
+
+
+def next_period_start(start, kind: str):
+    naive = start.replace(tzinfo=None)
+    if kind == "year":
+        naive = naive.replace(year=naive.year + 1)
+    elif kind == "month":
+        naive = (naive + timezone.timedelta(days=32)).replace(day=1)
+    else:
+        naive = naive + timezone.timedelta(days=1)
+    return timezone.make_aware(naive, start.tzinfo)
+
+
+def refresh_order_totals(order_ids: list) -> None:
+    Order.objects.filter(
+        pk__in=[order_id for order_id in order_ids if order_id]
+    ).refresh_totals()
+
+
+class DishOrderInline(admin.TabularInline):
+    model = DishOrder
+    fields = ("dish", "dish_amount", "unit_price")
+    autocomplete_fields = ("dish",)
+    extra = 0
+
+    def get_queryset(self, request) -> QuerySet:
+        return super().get_queryset(request).select_related("dish")
 
 
 @admin.register(Order)
@@ -18,20 +113,109 @@ class OrderAdmin(admin.ModelAdmin):
         "email",
         "phone_number",
         "status",
+        "order_total",
+        "item_count",
         "created_at",
     )
     list_display_links = (
         "id",
         "email",
     )
-    list_editable = ("status",)
     list_filter = ("status",)
-    search_fields = (
-        "id",
-        "email",
-        "phone_number",
-        "status",
-    )
+    form = OrderAdminForm
+    readonly_fields = ("total_price",)
+    date_hierarchy = "created_at"
+    change_list_template = "admin/probed_dates_change_list.html"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Matched by get_search_results, listed only to show the search box
+    search_fields = ("=id",)
+    search_help_text = "Order id, phone number or e-mail prefix"
+    inlines = [DishOrderInline]
+    actions = ["mark_delivered", "mark_canceled"]
+
+    def get_queryset(self, request) -> QuerySet:
+        return super().get_queryset(request).with_item_counts()
+
+    def get_changelist(self, request, **kwargs) -> type:
+        return ProbedDatesChangeList
+
+    def save_model(self, request, obj, form, change) -> None:
+        if not (change and "status" in form.changed_data):
+            super().save_model(request, obj, form, change)
+            return
+        # The status moves through the guarded transition, which records
+        # it, in case another admin moved the order in the meantime
+        status, obj.status = obj.status, form.initial["status"]
+        super().save_model(request, obj, form, change)
+        moved = Order.objects.filter(pk=obj.pk).transition(
+            status, changed_by=request.user
+        )
+        if moved:
+            obj.status = status
+        else:
+            obj.refresh_from_db(fields=["status"])
+            self.message_user(
+                request,
+                f"The order is {obj.status} now and can't be moved to "
+                f"{status}, its status was left unchanged.",
+                messages.WARNING,
+            )
+
+    def save_related(self, request, form, formsets, change) -> None:
+        super().save_related(request, form, formsets, change)
+        refresh_order_totals([form.instance.pk])
+
+    @admin.action(description="Mark selected orders as delivered")
+    def mark_delivered(self, request, queryset) -> None:
+        self.transition(request, queryset, Order.Status.DELIVERED)
+
+    @admin.action(description="Cancel selected orders")
+    def mark_canceled(self, request, queryset) -> None:
+        self.transition(request, queryset, Order.Status.CANCELED)
+
+    def transition(self, request, queryset, status: str) -> None:
+        selected = queryset.count()
+        moved = queryset.transition(status, changed_by=request.user)
+        self.message_user(request, f"{moved} orders moved to {status}.")
+        if moved < selected:
+            self.message_user(
+                request,
+                f"{selected - moved} orders can't be moved to {status} "
+                f"from their current status and were left unchanged.",
+                messages.WARNING,
+            )
+
+    def get_search_results(
+        self, request, queryset, search_term
+    ) -> tuple[QuerySet, bool]:
+        # Each kind of term hits one index instead of icontains scans
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        # isdigit() alone also accepts digits such as "²" int() rejects
+        if term.isascii() and term.isdigit():
+            condition = Q(pk=int(term)) if len(term) <= MAX_ID_DIGITS else Q()
+            if len(term) >= MIN_PHONE_DIGITS:
+                condition |= Q(phone_number__startswith=f"+{term}")
+        elif PHONE_SEARCH.match(term):
+            digits = re.sub(r"[^0-9]", "", term)
+            condition = Q(phone_number__startswith=f"+{digits}")
+        else:
+            # Served by the index on LOWER(email)
+            queryset = queryset.alias(email_lower=Lower("email"))
+            condition = Q(email_lower__startswith=term.lower())
+        return queryset.filter(condition), False
+
+    @admin.display(description="Total", ordering="total_price")
+    def order_total(self, order: Order) -> Decimal:
+        return order.order_price
+
+    @admin.display(description="Items")
+    def item_count(self, order: Order) -> int:
+        return order.item_count
 
 
 @admin.register(DishOrder)
@@ -41,6 +225,7 @@ class DishOrderAdmin(admin.ModelAdmin):
         "order",
         "dish",
         "dish_amount",
+        "unit_price",
     )
     list_display_links = (
         "id",
@@ -48,12 +233,87 @@ class DishOrderAdmin(admin.ModelAdmin):
         "order",
     )
     list_editable = ("dish_amount",)
-    list_filter = ("order",)
+    list_select_related = ("order", "dish")
+    # Filters with a fixed set of choices, never one entry per order
+    list_filter = (
+        "order__status",
+        ("order__created_at", admin.DateFieldListFilter),
+    )
+    raw_id_fields = ("order",)
+    autocomplete_fields = ("dish",)
     search_fields = (
+        "=id",
+        "=order__id",
+        "^dish__name",
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change) -> None:
+        super().save_model(request, obj, form, change)
+        refresh_order_totals([obj.order_id, form.initial.get("order")])
+
+    def delete_model(self, request, obj) -> None:
+        super().delete_model(request, obj)
+        refresh_order_totals([obj.order_id])
+
+    def delete_queryset(self, request, queryset) -> None:
+        order_ids = list(queryset.values_list("order_id", flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_order_totals(order_ids)
+
+
+class ReadOnlyAdminMixin:
+    def has_add_permission(self, request, obj=None) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def has_delete_permission(self, request, obj=None) -> bool:
+        return False
+
+
+class ArchivedDishOrderInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedDishOrder
+    fields = ("dish_name", "dish_amount", "unit_price")
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = (
         "id",
-        "dish",
-        "order",
+        "name",
+        "phone_number",
+        "status",
+        "total_price",
+        "created_at",
+        "archived_at",
+    )
+    list_filter = ("status",)
+    date_hierarchy = "created_at"
+    change_list_template = "admin/probed_dates_change_list.html"
+    show_full_result_count = False
+    search_fields = ("=id",)
+    inlines = [ArchivedDishOrderInline]
+
+    def get_changelist(self, request, **kwargs) -> type:
+        return ProbedDatesChangeList
+
+
+@admin.register(OrderStatusChange)
+class OrderStatusChangeAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = (
+        "order_id",
+        "from_status",
+        "to_status",
+        "changed_by",
+        "changed_at",
     )
+    list_select_related = ("changed_by",)
+    list_filter = ("to_status",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Customer)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PizzaDeliveryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "pizza_delivery"
+
+    def ready(self):
+        import pizza_delivery.signals  # noqa: F401
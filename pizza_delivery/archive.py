@@ -0,0 +1,109 @@
+from typing import Iterator
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from pizza_delivery.models import (
+    ArchivedDishOrder,
+    ArchivedOrder,
+    DishOrder,
+    Order,
+)
+
+ARCHIVED_STATUSES = (Order.Status.DELIVERED, Order.Status.CANCELED)
+ARCHIVE_BATCH_SIZE = 500
+ORDER_FIELDS = [
+    "id",
+    "status",
+    "created_at",
+    "updated_at",
+    "asked_date_delivery",
+    "name",
+    "phone_number",
+    "email",
+    "address",
+    "customer_id",
+    "total_price",
+]
+
+
+def archivable_orders(older_than: timezone.timedelta) -> QuerySet:
+    return Order.objects.filter(
+        status__in=ARCHIVED_STATUSES,
+        updated_at__lt=timezone.now() - older_than,
+    ).order_by("updated_at", "pk")
+
+
+def archive_orders(
+    older_than: timezone.timedelta, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> Iterator[tuple[int, int]]:
+    """
+    Move finished orders and their lines to the archive tables, one
+    transaction per batch. Yields ``(orders, lines)`` moved by each
+    batch, an interrupted run simply continues where it stopped.
+    """
+    orders = archivable_orders(older_than)
+    while True:
+        with transaction.atomic():
+            batch = list(
+                orders.select_for_update(skip_locked=True).values_list(
+                    "pk", flat=True
+                )[:batch_size]
+            )
+            if not batch:
+                return
+            moved = _move_orders(batch)
+        yield moved
+        if len(batch) < batch_size:
+            return
+
+
+def _move_orders(order_ids: list[int]) -> tuple[int, int]:
+    # Rows already copied by an earlier run are left as they are
+    archived_orders = ArchivedOrder.objects.bulk_create(
+        [
+            ArchivedOrder(**values)
+            for values in Order.objects.filter(pk__in=order_ids).values(
+                *ORDER_FIELDS
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    archived_lines = ArchivedDishOrder.objects.bulk_create(
+        [
+            ArchivedDishOrder(**values)
+            for values in DishOrder.objects.filter(order_id__in=order_ids)
+            .annotate(dish_name=F("dish__name"))
+            .values(
+                "id",
+                "order_id",
+                "dish_id",
+                "dish_name",
+                "dish_amount",
+                "unit_price",
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    Order.objects.filter(pk__in=order_ids).delete()
+    return len(archived_orders), len(archived_lines)
+
+
+def order_history(*fields: str, **filters) -> QuerySet:
+    """
+    Live and archived orders as one ``values()`` queryset for reports.
+    Only fields and lookups both tables share can be used.
+    """
+    fields = fields or ORDER_FIELDS
+    return (
+        Order.objects.filter(**filters)
+        .order_by()
+        .values(*fields)
+        .union(
+            ArchivedOrder.objects.filter(**filters)
+            .order_by()
+            .values(*fields),
+            all=True,
+        )
+    )
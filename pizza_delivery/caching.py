@@ -0,0 +1,233 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Callable, Hashable, NamedTuple
+
+from django.core.cache import caches
+
+SHARED_CACHE_ALIAS = "default"
+# Entries kept in each worker's memory, least recently used go first
+LOCAL_MAX_ENTRIES = 1024
+# A rebuild taking longer than this stops holding the other workers back
+REBUILD_LOCK_TIMEOUT = 10
+REBUILD_POLL_INTERVAL = 0.05
+STAT_NAMES = ("local_hits", "shared_hits", "stale_hits", "misses")
+
+
+class Entry(NamedTuple):
+    value: object
+    version: int
+    fresh_until: float
+    stale_until: float
+
+
+class LocalCache:
+    """Bounded least recently used mapping shared by a worker's threads."""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def make_key(namespace: str, key: Hashable) -> str:
+    # Hashed so any key fits the backend's length and character limits
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class TieredCache:
+    """
+    An in-process LocalCache in front of the cache backend shared by
+    all workers.
+
+    Keys live in namespaces and every entry remembers the version of
+    the data it was built from, readers asking for a newer version
+    miss. A missing or outdated entry is rebuilt by a single caller:
+    threads of a worker queue on a lock, workers on a lock key in the
+    shared cache. Meanwhile the old entry is served to everyone else
+    for up to ``stale_ttl`` seconds after it expired, callers without
+    an entry to fall back on wait for the rebuild.
+    """
+
+    def __init__(
+        self,
+        alias: str = SHARED_CACHE_ALIAS,
+        max_entries: int = LOCAL_MAX_ENTRIES,
+    ) -> None:
+        self.alias = alias
+        self.local = LocalCache(max_entries)
+        self._rebuild_locks = {}
+        self._lock = threading.Lock()
+        self._stats = defaultdict(Counter)
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_or_set(
+        self,
+        namespace: str,
+        key: Hashable,
+        version: int,
+        compute: Callable[[], object],
+        ttl: float,
+        stale_ttl: float = 0,
+    ) -> object:
+        cache_key = make_key(namespace, key)
+        now = time.time()
+        entry = self.local.get(cache_key)
+        if self._is_fresh(entry, version, now):
+            self._count(namespace, "local_hits")
+            return entry.value
+
+        shared_entry = self.shared.get(cache_key)
+        if self._is_fresh(shared_entry, version, now):
+            self.local.set(cache_key, shared_entry)
+            self._count(namespace, "shared_hits")
+            return shared_entry.value
+
+        stale = None
+        if stale_ttl:
+            stale = max(
+                (
+                    candidate
+                    for candidate in (entry, shared_entry)
+                    if candidate is not None and now < candidate.stale_until
+                ),
+                key=lambda candidate: candidate.version,
+                default=None,
+            )
+        return self._rebuild(
+            namespace, cache_key, version, compute, ttl, stale_ttl, stale
+        )
+
+    def stats(self) -> dict[str, dict]:
+        """Lookups of this worker per namespace, with their hit rate."""
+        with self._lock:
+            stats = {
+                namespace: {name: counts[name] for name in STAT_NAMES}
+                for namespace, counts in self._stats.items()
+            }
+        for counts in stats.values():
+            lookups = sum(counts.values())
+            counts["hit_rate"] = (
+                round(1 - counts["misses"] / lookups, 3) if lookups else None
+            )
+        return stats
+
+    def clear(self) -> None:
+        """Forget this worker's entries and counters."""
+        self.local.clear()
+        with self._lock:
+            self._stats.clear()
+
+    def _rebuild(
+        self,
+        namespace: str,
+        cache_key: str,
+        version: int,
+        compute: Callable[[], object],
+        ttl: float,
+        stale_ttl: float,
+        stale: Entry | None,
+    ) -> object:
+        with self._lock:
+            lock = self._rebuild_locks.setdefault(cache_key, threading.Lock())
+        if not lock.acquire(blocking=stale is None):
+            # Another thread of this worker is rebuilding it
+            self._count(namespace, "stale_hits")
+            return stale.value
+
+        try:
+            entry = self.local.get(cache_key)
+            if self._is_fresh(entry, version, time.time()):
+                # Rebuilt by the thread this one queued behind
+                self._count(namespace, "local_hits")
+                return entry.value
+
+            lock_key = f"{cache_key}:rebuild"
+            owns_lock = self.shared.add(
+                lock_key, os.getpid(), timeout=REBUILD_LOCK_TIMEOUT
+            )
+            if not owns_lock:
+                if stale is not None:
+                    self._count(namespace, "stale_hits")
+                    return stale.value
+                entry = self._wait_for(cache_key, lock_key, version)
+                if entry is not None:
+                    self.local.set(cache_key, entry)
+                    self._count(namespace, "shared_hits")
+                    return entry.value
+
+            # Not there in time, the rebuild happens here as well
+            self._count(namespace, "misses")
+            try:
+                value = compute()
+                now = time.time()
+                entry = Entry(
+                    value, version, now + ttl, now + ttl + stale_ttl
+                )
+                self.local.set(cache_key, entry)
+                self.shared.set(cache_key, entry, timeout=ttl + stale_ttl)
+            finally:
+                if owns_lock:
+                    self.shared.delete(lock_key)
+            return value
+        finally:
+            with self._lock:
+                self._rebuild_locks.pop(cache_key, None)
+            lock.release()
+
+    def _wait_for(
+        self, cache_key: str, lock_key: str, version: int
+    ) -> Entry | None:
+        deadline = time.monotonic() + REBUILD_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(REBUILD_POLL_INTERVAL)
+            entry = self.shared.get(cache_key)
+            if self._is_fresh(entry, version, time.time()):
+                return entry
+            if self.shared.get(lock_key) is None:
+                # The rebuild gave up without storing anything
+                return None
+        return None
+
+    @staticmethod
+    def _is_fresh(entry: Entry | None, version: int, now: float) -> bool:
+        # Newer entries serve readers that haven't seen the change yet
+        return (
+            entry is not None
+            and entry.version >= version
+            and now < entry.fresh_until
+        )
+
+    def _count(self, namespace: str, name: str) -> None:
+        with self._lock:
+            self._stats[namespace][name] += 1
+
+
+tiered_cache = TieredCache()
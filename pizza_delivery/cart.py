@@ -0,0 +1,464 @@
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Iterable
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, When
+from django.dispatch import Signal
+from django.http import HttpRequest
+from django.utils import timezone
+
+from pizza_delivery.caching import tiered_cache
+from pizza_delivery.models import CENTS, Customer, Dish, DishOrder, Order
+from pizza_delivery.versions import bump_version, current_version
+
+MAX_BATCH_OPERATIONS = 100
+CART_SESSION_KEY = "cart"
+CART_TOKEN_SESSION_KEY = "cart_token"
+CART_VERSION_SESSION_KEY = "cart_version"
+CART_SESSION_KEYS = (
+    CART_SESSION_KEY,
+    CART_TOKEN_SESSION_KEY,
+    CART_VERSION_SESSION_KEY,
+)
+# Changes to one session cart wait at most this long for each other, a
+# lock left behind by a crashed worker expires after it. The lock lives
+# in the default cache, it only keeps workers apart when that is a
+# backend they share, e.g. memcached, not the per-process LocMemCache
+CART_LOCK_TIMEOUT = 5
+CART_LOCK_POLL_INTERVAL = 0.01
+# Summaries are versioned per customer in the database, changes made
+# outside the cart classes, e.g. in the admin, show up once the entry
+# expires
+CART_SUMMARY_TTL = 5 * 60
+
+# Sent with ``order`` once an approved order is committed, follow-up work
+# such as notifications hooks in here instead of slowing down checkout
+order_approved = Signal()
+
+
+class InvalidCartOperation(Exception):
+    pass
+
+
+class CartBusy(Exception):
+    pass
+
+
+def merge_operations(operations: Iterable[tuple[int, int]]) -> dict:
+    deltas = defaultdict(int)
+    for dish_id, delta in operations:
+        deltas[dish_id] += delta
+    return {dish_id: delta for dish_id, delta in deltas.items() if delta}
+
+
+def summarize_lines(lines: Iterable[tuple[str, int, Decimal]]) -> dict:
+    order_items = []
+    total_price = Decimal("0.00")
+    for dish_name, dish_amount, line_price in lines:
+        line_price = line_price.quantize(CENTS)
+        total_price += line_price
+        order_items.append(
+            {
+                "dish_name": dish_name,
+                "dish_amount": dish_amount,
+                "dish_price": line_price,
+            }
+        )
+
+    return {"order_items": order_items, "total_price": total_price}
+
+
+class SessionCart:
+    """
+    Cart of an anonymous visitor. Lines live in the session, so
+    ``SESSION_ENGINE`` decides whether they are kept in the database,
+    the cache or a signed cookie, and the orders tables are only
+    written at checkout.
+
+    Changes hold a lock on the session in the shared cache, reload the
+    cart from the session store and save it before letting go, so
+    requests from several tabs add up instead of overwriting each other.
+    Signed cookie sessions have nothing to reload, there the last
+    response wins.
+    """
+
+    def __init__(self, session: SessionBase) -> None:
+        self.session = session
+
+    @property
+    def lines(self) -> dict:
+        # {"<dish id>": {"name": ..., "price": "10.00", "amount": 2}}
+        return self.session.get(CART_SESSION_KEY, {})
+
+    def add(self, deltas: dict, dishes: dict[int, Dish]) -> bool:
+        with self.locked():
+            lines = dict(self.lines)
+            created = not lines
+            if created:
+                self.session[CART_TOKEN_SESSION_KEY] = uuid.uuid4().hex
+            for dish_id, amount in deltas.items():
+                line = lines.get(str(dish_id))
+                if line is None:
+                    # Lines keep the name and price they were added with
+                    dish = dishes[dish_id]
+                    line = {
+                        "name": dish.name,
+                        "price": str(dish.price.quantize(CENTS)),
+                        "amount": 0,
+                    }
+                lines[str(dish_id)] = {
+                    **line, "amount": line["amount"] + amount
+                }
+            self.session[CART_SESSION_KEY] = lines
+            self.changed()
+        return created
+
+    def remove(self, deltas: dict) -> int:
+        with self.locked():
+            lines = dict(self.lines)
+            removed = 0
+            for dish_id, amount in deltas.items():
+                line = lines.pop(str(dish_id), None)
+                if line is None:
+                    continue
+                removed += 1
+                if line["amount"] > amount:
+                    lines[str(dish_id)] = {
+                        **line, "amount": line["amount"] - amount
+                    }
+
+            if not removed:
+                return 0
+            if lines:
+                self.session[CART_SESSION_KEY] = lines
+                self.changed()
+            else:
+                self.clear()
+        return removed
+
+    @contextmanager
+    def locked(self):
+        session_key = self.session.session_key
+        if session_key is None:
+            # A session without a cookie yet isn't shared with any other
+            # request, the session middleware saves it as usual
+            yield
+            return
+
+        lock_key = f"cart-lock:{session_key}"
+        # Only the holder's token releases the lock, one that expired
+        # under a slow change may belong to another request by then
+        token = uuid.uuid4().hex
+        shared = tiered_cache.shared
+        deadline = time.monotonic() + CART_LOCK_TIMEOUT
+        while not shared.add(lock_key, token, CART_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise CartBusy("Cart is being changed, try again")
+            time.sleep(CART_LOCK_POLL_INTERVAL)
+        try:
+            stored = self.session.__class__(session_key)
+            cart = {
+                key: stored[key] for key in CART_SESSION_KEYS if key in stored
+            }
+            if stored.session_key is None:
+                # Expired meanwhile, left to the session middleware
+                yield
+                return
+
+            for key in CART_SESSION_KEYS:
+                self.session.pop(key, None)
+            self.session.update(cart)
+            yield
+            self.session.save()
+            if self.session.session_key == session_key:
+                # Written already, the middleware would only write the
+                # same lines again after other requests changed them
+                self.session.modified = False
+        finally:
+            if shared.get(lock_key) == token:
+                shared.delete(lock_key)
+
+    def summary(self) -> dict:
+        return summarize_lines(
+            (
+                line["name"],
+                line["amount"],
+                Decimal(line["price"]) * line["amount"],
+            )
+            for line in self.lines.values()
+        )
+
+    def fragment_key(self) -> tuple:
+        # The token tells carts apart, empty carts all look the same
+        return (
+            "session",
+            self.session.get(CART_TOKEN_SESSION_KEY),
+            self.session.get(CART_VERSION_SESSION_KEY, 0),
+        )
+
+    def changed(self) -> None:
+        self.session[CART_VERSION_SESSION_KEY] = (
+            self.session.get(CART_VERSION_SESSION_KEY, 0) + 1
+        )
+
+    def clear(self) -> None:
+        self.session.pop(CART_SESSION_KEY, None)
+        self.session.pop(CART_TOKEN_SESSION_KEY, None)
+        self.session.pop(CART_VERSION_SESSION_KEY, None)
+
+    def checkout(self, contact: dict) -> Order | None:
+        lines = {int(dish_id): line for dish_id, line in self.lines.items()}
+        # Dishes removed from the menu since they were added are dropped
+        available = set(
+            Dish.objects.filter(pk__in=lines).values_list("pk", flat=True)
+        )
+        lines = {
+            dish_id: line
+            for dish_id, line in lines.items()
+            if dish_id in available
+        }
+        if not lines:
+            self.clear()
+            return None
+
+        dish_orders = [
+            DishOrder(
+                dish_id=dish_id,
+                dish_amount=line["amount"],
+                unit_price=Decimal(line["price"]),
+            )
+            for dish_id, line in lines.items()
+        ]
+        token = self.session.get(CART_TOKEN_SESSION_KEY) or uuid.uuid4().hex
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        status=Order.Status.APPROVED,
+                        checkout_token=token,
+                        total_price=sum(
+                            dish_order.unit_price * dish_order.dish_amount
+                            for dish_order in dish_orders
+                        ),
+                        **contact,
+                    )
+            except IntegrityError:
+                # A concurrent submit of the same cart was checked out first
+                self.clear()
+                return None
+
+            for dish_order in dish_orders:
+                dish_order.order = order
+            DishOrder.objects.bulk_create(dish_orders)
+            send_order_approved(order)
+
+        self.clear()
+        return order
+
+
+class DatabaseCart:
+    """
+    Cart of a logged-in customer, stored as their single open order so
+    it follows them across devices. Its summary is cached until the
+    cart changes.
+    """
+
+    def __init__(self, customer: Customer) -> None:
+        self.customer = customer
+        self.version_name = f"cart:{customer.pk}"
+
+    @property
+    def orders(self):
+        return Order.objects.filter(
+            customer=self.customer, status=Order.Status.CREATED
+        )
+
+    def get_order(self, create: bool = False) -> tuple[Order | None, bool]:
+        order = self.orders.first()
+        if order is not None or not create:
+            return order, False
+
+        # A concurrent request may insert the cart first, the partial unique
+        # constraint turns the loser's insert into a no-op
+        Order.objects.bulk_create(
+            [
+                Order(
+                    status=Order.Status.CREATED,
+                    customer=self.customer,
+                    asked_date_delivery=timezone.now(),
+                    name="",
+                    phone_number="",
+                    email="",
+                    address="",
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        return self.orders.get(), True
+
+    def add(self, deltas: dict, dishes: dict[int, Dish] = None) -> bool:
+        with transaction.atomic():
+            order, created = self.get_order(create=True)
+            add_to_cart(order, deltas)
+            self.changed()
+        return created
+
+    def remove(self, deltas: dict) -> int:
+        with transaction.atomic():
+            order, _ = self.get_order()
+            if order is None:
+                return 0
+            self.changed()
+            return remove_from_cart(order, deltas)
+
+    @property
+    def version(self) -> int:
+        # Kept in the database, every worker sees a change once committed
+        return current_version(self.version_name)
+
+    def summary(self) -> dict:
+        return tiered_cache.get_or_set(
+            "cart",
+            self.customer.pk,
+            self.version,
+            self.read_summary,
+            CART_SUMMARY_TTL,
+        )
+
+    def fragment_key(self) -> tuple:
+        return ("customer", self.customer.pk, self.version)
+
+    def read_summary(self) -> dict:
+        dish_orders = (
+            DishOrder.objects.filter(order__in=self.orders)
+            .with_line_totals()
+            .order_by("pk")
+            .values_list("dish__name", "dish_amount", "line_price")
+        )
+        return summarize_lines(dish_orders)
+
+    def changed(self) -> None:
+        # Committed together with the cart rows, the row lock queues up
+        # concurrent changes of the same cart
+        bump_version(self.version_name)
+
+    def clear(self) -> None:
+        self.orders.delete()
+        self.changed()
+
+    def checkout(self, contact: dict) -> Order | None:
+        with transaction.atomic():
+            # Concurrent cart changes and repeated submits wait on the lock
+            # and then find the cart already approved
+            order = self.orders.select_for_update().first()
+            if order is None:
+                return None
+            Order.objects.filter(pk=order.pk).approve(**contact)
+            self.changed()
+
+            order.refresh_from_db()
+            send_order_approved(order)
+        return order
+
+
+def send_order_approved(order: Order) -> None:
+    transaction.on_commit(
+        lambda: order_approved.send(sender=Order, order=order)
+    )
+
+
+def get_cart(request: HttpRequest) -> SessionCart | DatabaseCart:
+    if request.user.is_authenticated:
+        return DatabaseCart(request.user)
+    return SessionCart(request.session)
+
+
+def move_session_cart(session: SessionBase, customer: Customer) -> None:
+    session_cart = SessionCart(session)
+    deltas = {
+        int(dish_id): line["amount"]
+        for dish_id, line in session_cart.lines.items()
+    }
+    # Dishes removed from the menu since they were added are dropped,
+    # they have no price to snapshot into the order
+    available = set(
+        Dish.objects.filter(pk__in=deltas).values_list("pk", flat=True)
+    )
+    deltas = {
+        dish_id: delta
+        for dish_id, delta in deltas.items()
+        if dish_id in available
+    }
+    if deltas:
+        DatabaseCart(customer).add(deltas)
+    session_cart.clear()
+
+
+def add_to_cart(order: Order, deltas: dict) -> None:
+    table = DishOrder._meta.db_table
+    dish_table = Dish._meta.db_table
+    rows = [
+        (order.pk, dish_id, delta, dish_id)
+        for dish_id, delta in deltas.items()
+    ]
+    # New lines snapshot the current dish price, existing lines keep the
+    # price they were added at
+    values = ", ".join(
+        [f"(%s, %s, %s, (SELECT price FROM {dish_table} WHERE id = %s))"]
+        * len(rows)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} "
+            f"(order_id, dish_id, dish_amount, unit_price) VALUES {values} "
+            f"ON CONFLICT (order_id, dish_id) DO UPDATE "
+            f"SET dish_amount = {table}.dish_amount + excluded.dish_amount",
+            [value for row in rows for value in row],
+        )
+    Order.objects.filter(pk=order.pk).refresh_totals()
+
+
+def remove_from_cart(order: Order, deltas: dict) -> int:
+    removed = DishOrder.objects.filter(
+        order=order, dish_id__in=deltas
+    ).update(
+        dish_amount=Case(
+            *[
+                When(dish_id=dish_id, then=F("dish_amount") - amount)
+                for dish_id, amount in deltas.items()
+            ],
+            default=F("dish_amount"),
+        )
+    )
+    DishOrder.objects.filter(order=order, dish_amount__lte=0).delete()
+    Order.objects.filter(pk=order.pk, order_dishes__isnull=True).delete()
+    Order.objects.filter(pk=order.pk).refresh_totals()
+    return removed
+
+
+def apply_cart_operations(
+    cart: SessionCart | DatabaseCart, operations: Iterable[tuple[int, int]]
+) -> None:
+    deltas = merge_operations(operations)
+    if not deltas:
+        return
+
+    dishes = Dish.objects.only("name", "price").in_bulk(list(deltas))
+    if set(dishes) != set(deltas):
+        raise InvalidCartOperation("Dish does not exist")
+
+    added = {dish_id: delta for dish_id, delta in deltas.items() if delta > 0}
+    removed = {
+        dish_id: -delta for dish_id, delta in deltas.items() if delta < 0
+    }
+
+    with transaction.atomic():
+        if added:
+            cart.add(added, dishes)
+        if removed:
+            cart.remove(removed)
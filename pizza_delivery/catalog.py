@@ -0,0 +1,240 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from pizza_delivery.caching import tiered_cache
+from pizza_delivery.models import Dish
+from pizza_delivery.pagination import (
+    COUNT_LIMIT,
+    CursorPage,
+    CursorPaginator,
+    SequenceCursorPaginator,
+    ordering_key,
+)
+from pizza_delivery.search import search_dishes
+from pizza_delivery.versions import (
+    MENU_VERSION,
+    bump_version,
+    current_version,
+    version_changed_at,
+)
+
+# Seconds a worker serves its snapshot before looking at the menu version
+# again, changes made through another worker show up within this delay
+VERSION_CHECK_INTERVAL = 2.0
+# Orderings kept pre-sorted, others are sorted on demand
+MENU_ORDERINGS = (("price", "pk"), ("-price", "-pk"), ("name", "pk"))
+# Entries are versioned, the timeouts only bound how long they are kept
+MENU_TTL = 60 * 60
+SEARCH_TTL = 10 * 60
+# An older menu is served while another worker loads the new one
+MENU_STALE_TTL = 60
+
+
+@dataclass(frozen=True, slots=True)
+class DishRecord:
+    """Read-only copy of a dish with everything the menu pages show."""
+
+    id: int
+    name: str
+    description: str | None
+    price: Decimal
+    weight: int
+    image: str | None
+    # (ingredient name, quantity) in recipe order
+    ingredients: tuple[tuple[str, int], ...]
+    ingredient_summary: str
+    updated_at: datetime
+    # Digest of everything above, changes with any edit of the dish,
+    # its ingredients or their names
+    version: str
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    def get_absolute_url(self) -> str:
+        return reverse("pizza_delivery:dish-detail", kwargs={"pk": self.id})
+
+    @classmethod
+    def from_dish(cls, dish: Dish) -> "DishRecord":
+        fields = (
+            dish.pk,
+            dish.name,
+            dish.description,
+            dish.price,
+            dish.weight,
+            dish.image,
+            tuple(
+                (dish_ingredient.ingredient.name, dish_ingredient.quantity)
+                for dish_ingredient in dish.menu_ingredients
+            ),
+            dish.ingredient_summary,
+            dish.updated_at,
+        )
+        version = hashlib.sha1(repr(fields).encode()).hexdigest()[:16]
+        return cls(*fields, version)
+
+
+class MenuSnapshot:
+    """
+    Immutable menu of one menu version: dishes by id and pre-sorted for
+    every menu ordering.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        dishes: list[DishRecord],
+        changed_at: datetime | None = None,
+    ) -> None:
+        self.version = version
+        # When the menu version was bumped, i.e. the menu last changed
+        self.changed_at = changed_at or timezone.now()
+        self.dishes = MappingProxyType({dish.id: dish for dish in dishes})
+        self._orderings = {}
+        for ordering in MENU_ORDERINGS:
+            key = ordering_key(ordering)
+            ordered = tuple(sorted(dishes, key=key))
+            self._orderings[ordering] = (ordered, tuple(map(key, ordered)))
+
+    def ordered(self, ordering: tuple[str, ...]) -> tuple[DishRecord, ...]:
+        if ordering in self._orderings:
+            return self._orderings[ordering][0]
+        return tuple(
+            sorted(self.dishes.values(), key=ordering_key(ordering))
+        )
+
+    def paginator(
+        self, ordering: tuple[str, ...], per_page: int
+    ) -> SequenceCursorPaginator:
+        if ordering in self._orderings:
+            # Sort keys are kept with the pre-sorted orderings
+            ordered, keys = self._orderings[ordering]
+            return SequenceCursorPaginator(ordered, per_page, ordering, keys)
+        return SequenceCursorPaginator(
+            self.ordered(ordering), per_page, ordering
+        )
+
+    @classmethod
+    def load(cls) -> "MenuSnapshot":
+        # The version is read before the dishes, a change committed in
+        # between is picked up again on the next check
+        version, changed_at = version_changed_at(MENU_VERSION)
+        version, changed_at, dishes = tiered_cache.get_or_set(
+            "menu",
+            "snapshot",
+            version,
+            lambda: (version, changed_at, read_menu()),
+            MENU_TTL,
+            stale_ttl=MENU_STALE_TTL,
+        )
+        return cls(version, dishes, changed_at)
+
+
+def read_menu() -> list[DishRecord]:
+    dishes = Dish.objects.for_menu().order_by("pk")
+    return [DishRecord.from_dish(dish) for dish in dishes]
+
+
+class MenuCache:
+    """
+    Per-process holder of the current MenuSnapshot. Serving it costs no
+    queries, the menu version is read at most once per
+    VERSION_CHECK_INTERVAL and the menu reloaded only when it changed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def get(self) -> MenuSnapshot:
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL
+        ):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or (
+                time.monotonic() - self._checked_at >= VERSION_CHECK_INTERVAL
+                and current_version(MENU_VERSION) != snapshot.version
+            ):
+                snapshot = MenuSnapshot.load()
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def clear(self) -> None:
+        self._snapshot = None
+
+
+menu_cache = MenuCache()
+
+
+def get_menu() -> MenuSnapshot:
+    return menu_cache.get()
+
+
+def search_menu(
+    query: str, ordering: tuple[str, ...], cursor: str | None, per_page: int
+) -> CursorPage:
+    """
+    Page of the dishes matching ``query``. The matching dish ids and the
+    cursors are cached per menu version, the dishes come from the menu
+    snapshot.
+    """
+    menu = get_menu()
+
+    def search() -> tuple:
+        paginator = CursorPaginator(
+            search_dishes(Dish.objects.for_menu(), query), per_page, ordering
+        )
+        page = paginator.page(cursor)
+        return (
+            [dish.pk for dish in page],
+            page.number,
+            page.previous_cursors,
+            page.next_cursors,
+            paginator.approximate_count(),
+        )
+
+    dish_ids, number, previous_cursors, next_cursors, count = (
+        tiered_cache.get_or_set(
+            "search",
+            (query, ordering, cursor, per_page),
+            menu.version,
+            search,
+            SEARCH_TTL,
+        )
+    )
+    return CursorPage(
+        # Results cached for a newer menu may name dishes this worker
+        # doesn't know yet
+        [menu.dishes[pk] for pk in dish_ids if pk in menu.dishes],
+        number,
+        previous_cursors,
+        next_cursors,
+        count,
+        # Past COUNT_LIMIT the count is the planner's estimate
+        count_estimated=count >= COUNT_LIMIT,
+    )
+
+
+def bump_menu_version() -> None:
+    bump_version(MENU_VERSION)
+    # This worker drops its copy right away and once more after commit,
+    # in case a request reloaded the menu before the change was visible
+    menu_cache.clear()
+    transaction.on_commit(menu_cache.clear)
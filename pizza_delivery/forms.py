@@ -10,7 +10,8 @@ from django.contrib.auth.forms import (
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from pizza_delivery.models import Order
+from pizza_delivery.models import Order, STATUS_TRANSITIONS
+from pizza_delivery.order_export import EXPORT_STATUSES
 from pizza_delivery.validators import (
     customer_name_validator,
     customer_phone_number_validator,
@@ -222,6 +223,26 @@ class OrderUpdateForm(forms.ModelForm):
         return asked_date_delivery
 
 
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = "__all__"
+
+    def clean_status(self):
+        # Staff follow the same transitions as the bulk actions
+        status = self.cleaned_data.get("status")
+        previous = self.initial.get("status")
+        if (
+            self.instance.pk
+            and status != previous
+            and previous not in STATUS_TRANSITIONS.get(status, ())
+        ):
+            raise forms.ValidationError(
+                f"Orders can't be moved from {previous} to {status}"
+            )
+        return status
+
+
 class CustomerUpdateForm(forms.ModelForm):
     class Meta:
         model = get_user_model()
@@ -255,3 +276,80 @@ class CustomerUpdateForm(forms.ModelForm):
 
     def clean_address(self):
         return customer_address_validator(self.cleaned_data.get("address"))
+
+
+class DateRangeForm(forms.Form):
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get("date_from")
+        date_to = cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("date_from is after date_to")
+        return cleaned_data
+
+
+class OrderExportForm(DateRangeForm):
+    status = forms.MultipleChoiceField(
+        choices=[(status.value, status.label) for status in EXPORT_STATUSES],
+        required=False,
+    )
+    format = forms.ChoiceField(
+        choices=[("csv", "CSV"), ("ndjson", "NDJSON")], required=False
+    )
+
+    def filters(self) -> dict:
+        # Whole days in the current time zone, as created_at ranges so the
+        # created_at indexes apply
+        filters = {
+            "status__in": self.cleaned_data["status"] or EXPORT_STATUSES
+        }
+        if self.cleaned_data["date_from"]:
+            filters["created_at__gte"] = self._start_of(
+                self.cleaned_data["date_from"]
+            )
+        if self.cleaned_data["date_to"]:
+            filters["created_at__lt"] = self._start_of(
+                self.cleaned_data["date_to"] + timezone.timedelta(days=1)
+            )
+        return filters
+
+    @staticmethod
+    def _start_of(day) -> timezone.datetime:
+        return timezone.make_aware(
+            timezone.datetime.combine(day, timezone.datetime.min.time())
+        )
+
+
+class SalesReportForm(DateRangeForm):
+    # Rollup rows grow with days and dishes, not orders, a bounded range
+    # keeps every report small
+    MAX_DAYS = 366
+    DEFAULT_DAYS = 30
+
+    date_from = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+    date_to = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+
+        date_to = cleaned_data.get("date_to") or timezone.localdate()
+        date_from = cleaned_data.get("date_from") or (
+            date_to - timezone.timedelta(days=self.DEFAULT_DAYS - 1)
+        )
+        if date_from > date_to:
+            raise forms.ValidationError("date_from is after date_to")
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise forms.ValidationError(
+                f"Reports cover at most {self.MAX_DAYS} days"
+            )
+        cleaned_data.update(date_from=date_from, date_to=date_to)
+        return cleaned_data
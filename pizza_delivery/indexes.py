@@ -0,0 +1,22 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import models
+
+
+class PatternOpsIndex(models.Index):
+    """
+    Index on expressions that PostgreSQL builds with ``text_pattern_ops``
+    so it serves LIKE 'prefix%', other backends build it plain as they
+    do with ``Index.opclasses``.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        index = self
+        if schema_editor.connection.vendor == "postgresql":
+            index = self.clone()
+            index.expressions = tuple(
+                OpClass(expression, name="text_pattern_ops")
+                for expression in self.expressions
+            )
+        return super(PatternOpsIndex, index).create_sql(
+            model, schema_editor, using=using, **kwargs
+        )
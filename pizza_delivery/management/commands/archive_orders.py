@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pizza_delivery.archive import (
+    ARCHIVE_BATCH_SIZE,
+    archivable_orders,
+    archive_orders,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move delivered and canceled orders older than --days, with their "
+        "lines, from the live tables into the archive tables. Each batch "
+        "is its own transaction, an interrupted run can simply be "
+        "started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Finished orders untouched for this many days are moved.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help="Orders moved per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many orders would be moved.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.timedelta(days=options["days"])
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Would archive {archivable_orders(older_than).count()} orders"
+            )
+            return
+
+        started = time.perf_counter()
+        orders = lines = 0
+        for moved_orders, moved_lines in archive_orders(
+            older_than, options["batch_size"]
+        ):
+            orders += moved_orders
+            lines += moved_lines
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Archived {orders} orders and {lines} lines in {elapsed:.2f} s "
+            f"({orders / max(elapsed, 1e-6):.0f} orders/s)"
+        )
@@ -0,0 +1,85 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.utils import timezone
+
+from pizza_delivery.caching import tiered_cache
+from pizza_delivery.catalog import DishRecord
+
+INGREDIENTS = (("Mozzarella", 2), ("Tomato", 1), ("Basil", 1))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render time of a page of dish cards rendered one by one "
+        "against the cached card fragments. Dishes are made up in memory, "
+        "the database isn't touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cards",
+            type=int,
+            default=6,
+            help="Dish cards per page.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Renders per variant, the median is reported.",
+        )
+
+    def handle(self, *args, **options):
+        dishes = [
+            DishRecord(
+                id=number,
+                name=f"Dish {number}",
+                description=None,
+                price=Decimal("12.50"),
+                weight=500,
+                image=None,
+                ingredients=INGREDIENTS,
+                ingredient_summary=", ".join(
+                    f"x{quantity} {name}" for name, quantity in INGREDIENTS
+                ),
+                updated_at=timezone.now(),
+                version=f"benchmark-{number}",
+            )
+            for number in range(1, options["cards"] + 1)
+        ]
+        context = {
+            "dishes_list": dishes,
+            "request": RequestFactory().get("/"),
+        }
+        card = get_template("includes/dish_card.html")
+        cards = get_template("includes/dish_cards.html")
+
+        uncached = self.median_ms(
+            lambda: "".join(
+                card.render({**context, "dish": dish}) for dish in dishes
+            ),
+            options["repeat"],
+        )
+        cards.render(context)
+        cached = self.median_ms(
+            lambda: cards.render(context), options["repeat"]
+        )
+        self.stdout.write(
+            f"{len(dishes)} cards: rendered {uncached:.3f} ms, "
+            f"cached {cached:.3f} ms ({uncached / cached:.1f}x)"
+        )
+        self.stdout.write(f"Hit rates: {tiered_cache.stats()}")
+
+    @staticmethod
+    def median_ms(run, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
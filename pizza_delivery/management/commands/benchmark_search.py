@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from pizza_delivery.models import Dish, DishIngredient, Ingredient
+from pizza_delivery.search import refresh_search_documents, search_dishes
+
+INGREDIENT_NAMES = [
+    "Mozzarella",
+    "Tomato",
+    "Basil",
+    "Pepperoni",
+    "Mushrooms",
+    "Olives",
+    "Onion",
+    "Ham",
+    "Pineapple",
+    "Gorgonzola",
+    "Parmesan",
+    "Jalapeno",
+]
+QUERIES = ["rella", "Gorgonzola", "Dish 4242", "Pine"]
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare index search latency of the full-text index against "
+        "the legacy icontains + DISTINCT query. Generated dishes are "
+        "rolled back when the benchmark finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000],
+            help="Dish counts to benchmark at.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per query, the median is reported.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run_benchmark(sorted(options["sizes"]), options["repeat"])
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, sizes: list[int], repeat: int) -> None:
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name) for name in INGREDIENT_NAMES
+        )
+        random.seed(0)
+        created = Dish.objects.count()
+
+        for size in sizes:
+            if size > created:
+                self.create_dishes(created, size, ingredients)
+                created = size
+
+            self.stdout.write(f"{created} dishes:")
+            for query in QUERIES:
+                legacy = self.median_ms(
+                    lambda: self.legacy_search(query), repeat
+                )
+                full_text = self.median_ms(
+                    lambda: list(
+                        search_dishes(Dish.objects.all(), query)[:PAGE_SIZE]
+                    ),
+                    repeat,
+                )
+                self.stdout.write(
+                    f"  {query!r:14} icontains {legacy:9.2f} ms   "
+                    f"full-text {full_text:9.2f} ms"
+                )
+
+    def create_dishes(
+        self, start: int, stop: int, ingredients: list[Ingredient]
+    ) -> None:
+        dishes = Dish.objects.bulk_create(
+            (
+                Dish(
+                    name=f"Dish {number}",
+                    price=Decimal(random.randint(500, 3000)) / 100,
+                    weight=500,
+                )
+                for number in range(start, stop)
+            ),
+            batch_size=1000,
+        )
+        DishIngredient.objects.bulk_create(
+            (
+                DishIngredient(dish=dish, ingredient=ingredient)
+                for dish in dishes
+                for ingredient in random.sample(ingredients, 3)
+            ),
+            batch_size=1000,
+        )
+        refresh_search_documents(dish.pk for dish in dishes)
+
+    @staticmethod
+    def legacy_search(query: str) -> list[Dish]:
+        return list(
+            Dish.objects.filter(
+                Q(name__icontains=query)
+                | Q(ingredients__name__icontains=query)
+            )
+            .distinct()
+            .order_by("price")[:PAGE_SIZE]
+        )
+
+    @staticmethod
+    def median_ms(run, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from pizza_delivery.menu_io import (
+    MENU_BATCH_SIZE,
+    export_menu,
+    write_csv,
+    write_jsonl,
+)
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every dish with its ingredients and their quantities as "
+        "CSV or JSON Lines, to stdout or --output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=list(WRITERS),
+            default="jsonl",
+            help="Output format.",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write instead of stdout.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=MENU_BATCH_SIZE,
+            help="Dishes fetched per query.",
+        )
+
+    def handle(self, *args, **options):
+        write = WRITERS[options["format"]]
+        records = export_menu(options["batch_size"])
+        if not options["output"]:
+            write(records, self.stdout)
+            return
+
+        with open(
+            options["output"], "w", encoding="utf-8", newline=""
+        ) as stream:
+            written = write(records, stream)
+        self.stderr.write(f"Exported {written} dishes to {options['output']}")
@@ -0,0 +1,77 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pizza_delivery.menu_io import (
+    MENU_BATCH_SIZE,
+    MenuImportError,
+    import_menu,
+    read_csv,
+    read_jsonl,
+)
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update dishes, matched by name, with their ingredients "
+        "from a CSV or JSON Lines file as written by export_menu. Each "
+        "batch is its own transaction, batches before an invalid record "
+        "stay imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help='File to read, "-" reads stdin.',
+        )
+        parser.add_argument(
+            "--format",
+            choices=list(READERS),
+            help="Input format, guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=MENU_BATCH_SIZE,
+            help="Dishes written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "jsonl"
+        )
+        if path == "-":
+            self.run(READERS[input_format](sys.stdin), options)
+            return
+
+        try:
+            stream = open(path, encoding="utf-8", newline="")
+        except OSError as error:
+            raise CommandError(error)
+        with stream:
+            self.run(READERS[input_format](stream), options)
+
+    def run(self, records, options) -> None:
+        started = time.perf_counter()
+        created = updated = 0
+        try:
+            for batch_created, batch_updated in import_menu(
+                records, options["batch_size"]
+            ):
+                created += batch_created
+                updated += batch_updated
+        except MenuImportError as error:
+            raise CommandError(
+                f"{error}, {created + updated} dishes imported before it"
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Created {created} and updated {updated} dishes in "
+            f"{elapsed:.2f} s "
+            f"({(created + updated) / max(elapsed, 1e-6):.0f} dishes/s)"
+        )
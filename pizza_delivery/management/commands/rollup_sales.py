@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pizza_delivery.rollups import rebuild_sales, rollup_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the daily sales rollups up to date. Only days with orders "
+        "changed since the last run are recomputed, run it every few "
+        "minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute every day from the first order on.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options["rebuild"]:
+            days = rebuild_sales()
+        else:
+            days = rollup_sales()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Refreshed {len(days)} days in {elapsed:.2f} s"
+            + (f" ({days[0]} to {days[-1]})" if days else "")
+        )
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from pizza_delivery.models import STATUS_TRANSITIONS, Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Move orders to another status in one transaction, e.g. mark the "
+        "evening's approved orders delivered. Orders whose current status "
+        "can't make the move are skipped, every move is recorded in the "
+        "order status history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "status",
+            choices=list(STATUS_TRANSITIONS),
+            help="Status the orders are moved to.",
+        )
+        parser.add_argument(
+            "--ids",
+            type=int,
+            nargs="+",
+            help="Only move these orders.",
+        )
+        parser.add_argument(
+            "--created-before",
+            help="Only move orders created before this ISO date and time.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username recorded as the author of the moves.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many orders would be moved.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["ids"] and not options["created_before"]:
+            raise CommandError("Pass --ids or --created-before")
+
+        orders = Order.objects.all()
+        if options["ids"]:
+            orders = orders.filter(pk__in=options["ids"])
+        if options["created_before"]:
+            orders = orders.filter(
+                created_at__lt=self.parse_moment(options["created_before"])
+            )
+
+        changed_by = None
+        if options["user"]:
+            try:
+                changed_by = get_user_model().objects.get_by_natural_key(
+                    options["user"]
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}")
+
+        status = options["status"]
+        if options["dry_run"]:
+            movable = orders.filter(status__in=STATUS_TRANSITIONS[status])
+            self.stdout.write(
+                f"Would move {movable.count()} orders to {status}"
+            )
+            return
+
+        moved = orders.transition(status, changed_by=changed_by)
+        self.stdout.write(f"Moved {moved} orders to {status}")
+
+    @staticmethod
+    def parse_moment(value: str):
+        moment = parse_datetime(value)
+        if moment is None:
+            raise CommandError(f"Invalid date and time {value!r}")
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
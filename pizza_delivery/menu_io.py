@@ -0,0 +1,275 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import IO, Iterable, Iterator
+
+from django.db import transaction
+from django.utils import timezone
+
+from pizza_delivery.catalog import bump_menu_version
+from pizza_delivery.models import CENTS, Dish, DishIngredient, Ingredient
+from pizza_delivery.search import refresh_search_documents
+
+MENU_BATCH_SIZE = 1000
+DISH_FIELDS = ["name", "description", "price", "weight", "image"]
+CSV_FIELDS = [*DISH_FIELDS, "ingredients"]
+# CSV keeps a dish's ingredients in one column, "Mozzarella:2;Basil:1"
+INGREDIENT_SEPARATOR = ";"
+QUANTITY_SEPARATOR = ":"
+
+
+class MenuImportError(ValueError):
+    pass
+
+
+def export_menu(batch_size: int = MENU_BATCH_SIZE) -> Iterator[dict]:
+    dishes = Dish.objects.for_menu().order_by("pk")
+    for dish in dishes.iterator(chunk_size=batch_size):
+        yield {
+            "name": dish.name,
+            "description": dish.description,
+            "price": str(dish.price.quantize(CENTS)),
+            "weight": dish.weight,
+            "image": dish.image,
+            "ingredients": [
+                {
+                    "name": dish_ingredient.ingredient.name,
+                    "quantity": dish_ingredient.quantity,
+                }
+                for dish_ingredient in dish.menu_ingredients
+            ],
+        }
+
+
+def write_jsonl(records: Iterable[dict], stream: IO) -> int:
+    written = 0
+    for written, record in enumerate(records, start=1):
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return written
+
+
+def write_csv(records: Iterable[dict], stream: IO) -> int:
+    writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    written = 0
+    for written, record in enumerate(records, start=1):
+        writer.writerow(
+            {
+                **record,
+                "ingredients": INGREDIENT_SEPARATOR.join(
+                    f"{ingredient['name']}{QUANTITY_SEPARATOR}"
+                    f"{ingredient['quantity']}"
+                    for ingredient in record["ingredients"]
+                ),
+            }
+        )
+    return written
+
+
+def read_jsonl(stream: IO) -> Iterator[dict]:
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise MenuImportError(f"Line {number}: {error}")
+
+
+def read_csv(stream: IO) -> Iterator[dict]:
+    for row in csv.DictReader(stream):
+        ingredients = []
+        for item in (row.get("ingredients") or "").split(
+            INGREDIENT_SEPARATOR
+        ):
+            name, _, quantity = item.strip().rpartition(QUANTITY_SEPARATOR)
+            if not name:
+                # No quantity given, the whole item is the name
+                name, quantity = quantity, 1
+            if name:
+                ingredients.append({"name": name, "quantity": quantity})
+        yield {**row, "ingredients": ingredients}
+
+
+def import_menu(
+    records: Iterable[dict], batch_size: int = MENU_BATCH_SIZE
+) -> Iterator[tuple[int, int]]:
+    """
+    Upsert dishes by name with their ingredients and quantities, one
+    transaction per batch. Ingredients are matched by name and created
+    when missing, a dish's ingredient list is replaced by the imported
+    one. Yields ``(created, updated)`` dishes of each batch, unchanged
+    dishes count as neither.
+    """
+    records = iter(records)
+    number = 0
+    while True:
+        batch = {}
+        for record in islice(records, batch_size):
+            number += 1
+            # A dish repeated within a batch keeps its last record
+            dish = clean_record(record, number)
+            batch[dish["name"]] = dish
+        if not batch:
+            return
+        with transaction.atomic():
+            imported = _import_batch(list(batch.values()))
+        yield imported
+
+
+def clean_record(record: dict, number: int) -> dict:
+    try:
+        name = str(record["name"]).strip()
+        if not name or len(name) > Dish._meta.get_field("name").max_length:
+            raise ValueError(f"invalid name {name!r}")
+        price = Decimal(str(record["price"])).quantize(CENTS)
+        if price < 0:
+            raise ValueError(f"negative price {price}")
+        weight = int(record["weight"])
+        if weight < 0:
+            raise ValueError(f"negative weight {weight}")
+        ingredients = {}
+        max_length = Ingredient._meta.get_field("name").max_length
+        for ingredient in record.get("ingredients") or []:
+            ingredient_name = str(ingredient["name"]).strip()
+            if not ingredient_name or len(ingredient_name) > max_length:
+                raise ValueError(f"invalid ingredient {ingredient_name!r}")
+            quantity = int(ingredient.get("quantity", 1))
+            if quantity < 1:
+                raise ValueError(
+                    f"quantity {quantity} of {ingredient_name!r} below 1"
+                )
+            ingredients[ingredient_name] = quantity
+    except (KeyError, TypeError, ValueError, InvalidOperation) as error:
+        raise MenuImportError(f"Record {number}: {error}")
+
+    return {
+        "name": name,
+        "description": record.get("description") or None,
+        "price": price,
+        "weight": weight,
+        "image": record.get("image") or None,
+        "ingredients": ingredients,
+    }
+
+
+def _import_batch(records: list[dict]) -> tuple[int, int]:
+    ingredient_ids = _ingredient_ids(
+        {name for record in records for name in record["ingredients"]}
+    )
+
+    existing = _dishes_by_name([record["name"] for record in records])
+    new_dishes, changed_dishes = [], []
+    for record in records:
+        dish = existing.get(record["name"])
+        if dish is None:
+            new_dishes.append(
+                Dish(**{field: record[field] for field in DISH_FIELDS})
+            )
+        elif any(
+            getattr(dish, field) != record[field] for field in DISH_FIELDS
+        ):
+            for field in DISH_FIELDS:
+                setattr(dish, field, record[field])
+            changed_dishes.append(dish)
+
+    Dish.objects.bulk_create(new_dishes)
+    if changed_dishes:
+        # An upsert on the primary key is a single plain statement,
+        # bulk_update() builds a CASE WHEN per field and row instead
+        Dish.objects.bulk_create(
+            changed_dishes,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=[*DISH_FIELDS[1:], "updated_at"],
+        )
+    dish_ids = {name: dish.pk for name, dish in existing.items()}
+    dish_ids.update(
+        (name, dish.pk)
+        for name, dish in _dishes_by_name(
+            [dish.name for dish in new_dishes]
+        ).items()
+    )
+
+    wanted = {
+        (dish_ids[record["name"]], ingredient_ids[name]): quantity
+        for record in records
+        for name, quantity in record["ingredients"].items()
+    }
+    current = {
+        (dish_id, ingredient_id): (pk, quantity)
+        for pk, dish_id, ingredient_id, quantity in (
+            DishIngredient.objects.filter(
+                dish_id__in=dish_ids.values()
+            ).values_list("pk", "dish_id", "ingredient_id", "quantity")
+        )
+    }
+    stale = {key: pk for key, (pk, _) in current.items() if key not in wanted}
+    changed_lines = {
+        key: quantity
+        for key, quantity in wanted.items()
+        if key not in current or current[key][1] != quantity
+    }
+    if stale:
+        # Nothing references recipe lines, a raw delete skips the per row
+        # signals whose work is done once for the batch below
+        stale_lines = DishIngredient.objects.filter(pk__in=stale.values())
+        stale_lines._raw_delete(stale_lines.db)
+    DishIngredient.objects.bulk_create(
+        [
+            DishIngredient(
+                dish_id=dish_id,
+                ingredient_id=ingredient_id,
+                quantity=quantity,
+            )
+            for (dish_id, ingredient_id), quantity in changed_lines.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["dish", "ingredient"],
+        update_fields=["quantity"],
+    )
+
+    new_ids = {dish_ids[dish.name] for dish in new_dishes}
+    new_lines = {dish_id for dish_id, _ in [*stale, *changed_lines]}
+    # Bulk writes skip the signals that keep search documents in step,
+    # documents are built from names only, so prices and weights don't
+    # need a refresh
+    refresh_search_documents(new_ids | new_lines)
+    updated = {dish.pk for dish in changed_dishes} | new_lines
+    Dish.objects.filter(pk__in=new_lines - new_ids).update(
+        updated_at=timezone.now()
+    )
+    if new_ids or updated:
+        bump_menu_version()
+    return len(new_ids), len(updated - new_ids)
+
+
+def _dishes_by_name(names: list[str]) -> dict[str, Dish]:
+    if not names:
+        return {}
+    # Names aren't unique, a duplicate name maps to its oldest dish
+    dishes = Dish.objects.filter(name__in=names).order_by("-pk")
+    return {dish.name: dish for dish in dishes}
+
+
+def _ingredient_ids(names: set[str]) -> dict[str, int]:
+    if not names:
+        return {}
+    ingredient_ids = _ingredient_ids_by_name(names)
+    missing = names - set(ingredient_ids)
+    if missing:
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name) for name in sorted(missing)
+        )
+        ingredient_ids.update(_ingredient_ids_by_name(missing))
+    return ingredient_ids
+
+
+def _ingredient_ids_by_name(names: set[str]) -> dict[str, int]:
+    # Existing duplicates by name collapse onto the oldest ingredient
+    return dict(
+        Ingredient.objects.filter(name__in=names)
+        .order_by("-pk")
+        .values_list("name", "pk")
+    )
@@ -0,0 +1,136 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEARCH_TABLE = "pizza_delivery_dishsearchdocument"
+FTS_TABLE = f"{SEARCH_TABLE}_fts"
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        document,
+        content='{SEARCH_TABLE}',
+        content_rowid='dish_id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {SEARCH_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document)
+        VALUES (new.dish_id, new.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {SEARCH_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document)
+        VALUES ('delete', old.dish_id, old.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {SEARCH_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document)
+        VALUES ('delete', old.dish_id, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, document)
+        VALUES (new.dish_id, new.document);
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    ALTER TABLE {SEARCH_TABLE} ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', document)) STORED
+    """,
+    f"""
+    CREATE INDEX {SEARCH_TABLE}_vector_gin
+    ON {SEARCH_TABLE} USING gin (search_vector)
+    """,
+    f"""
+    CREATE INDEX {SEARCH_TABLE}_trgm_gin
+    ON {SEARCH_TABLE} USING gin (document gin_trgm_ops)
+    """,
+]
+POSTGRESQL_BACKWARD = [
+    f"DROP INDEX IF EXISTS {SEARCH_TABLE}_trgm_gin",
+    f"DROP INDEX IF EXISTS {SEARCH_TABLE}_vector_gin",
+    f"ALTER TABLE {SEARCH_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_vendor_sql(statements_by_vendor: dict):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(
+            schema_editor.connection.vendor, []
+        ):
+            schema_editor.execute(statement)
+
+    return run
+
+
+def build_search_documents(apps, schema_editor):
+    Dish = apps.get_model("pizza_delivery", "Dish")
+    DishSearchDocument = apps.get_model("pizza_delivery", "DishSearchDocument")
+
+    documents = []
+    for dish in Dish.objects.prefetch_related("dish_ingredients__ingredient"):
+        ingredient_names = [
+            dish_ingredient.ingredient.name
+            for dish_ingredient in dish.dish_ingredients.all()
+        ]
+        documents.append(
+            DishSearchDocument(
+                dish=dish, document=" ".join([dish.name, *ingredient_names])
+            )
+        )
+    DishSearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0002_alter_dish_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DishSearchDocument",
+            fields=[
+                (
+                    "dish",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="pizza_delivery.dish",
+                    ),
+                ),
+                ("document", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(
+            run_vendor_sql(
+                {
+                    "sqlite": SQLITE_FORWARD,
+                    "postgresql": POSTGRESQL_FORWARD,
+                }
+            ),
+            run_vendor_sql(
+                {
+                    "sqlite": SQLITE_BACKWARD,
+                    "postgresql": POSTGRESQL_BACKWARD,
+                }
+            ),
+        ),
+        migrations.RunPython(
+            build_search_documents, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:05
+
+from django.db import migrations
+
+
+def merge_open_orders(apps, schema_editor):
+    Order = apps.get_model("pizza_delivery", "Order")
+    DishOrder = apps.get_model("pizza_delivery", "DishOrder")
+
+    open_orders = {}
+    for order in Order.objects.filter(status="created").order_by(
+        "created_at", "pk"
+    ):
+        owner = (
+            ("customer", order.customer_id)
+            if order.customer_id
+            else ("session", order.session_key)
+        )
+        if owner[1] is None:
+            continue
+        cart = open_orders.setdefault(owner, order)
+        if cart.pk != order.pk:
+            DishOrder.objects.filter(order=order).update(order=cart)
+            order.delete()
+
+    # Collapse repeated dishes of one order into a single line
+    lines = {}
+    for dish_order in DishOrder.objects.order_by("pk"):
+        key = (dish_order.order_id, dish_order.dish_id)
+        line = lines.setdefault(key, dish_order)
+        if line.pk != dish_order.pk:
+            line.dish_amount += dish_order.dish_amount
+            line.save(update_fields=["dish_amount"])
+            dish_order.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0003_dishsearchdocument"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_open_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0004_merge_open_orders"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="dishorder",
+            constraint=models.UniqueConstraint(
+                fields=("order", "dish"), name="unique_dish_per_order"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="order",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "created")),
+                fields=("customer",),
+                name="unique_open_order_per_customer",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="order",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "created")),
+                fields=("session_key",),
+                name="unique_open_order_per_session",
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:40
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0005_single_open_order"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dishorder",
+            name="unit_price",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=8, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total_price",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=12
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:40
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_prices(apps, schema_editor):
+    Dish = apps.get_model("pizza_delivery", "Dish")
+    DishOrder = apps.get_model("pizza_delivery", "DishOrder")
+    Order = apps.get_model("pizza_delivery", "Order")
+
+    # Historical lines can only be priced at today's dish price
+    DishOrder.objects.filter(unit_price__isnull=True).update(
+        unit_price=Subquery(
+            Dish.objects.filter(pk=OuterRef("dish_id")).values("price")[:1]
+        )
+    )
+    line_totals = (
+        DishOrder.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(F("unit_price") * F("dish_amount")))
+        .values("total")
+    )
+    Order.objects.update(
+        total_price=Coalesce(
+            Subquery(line_totals),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0006_price_snapshot"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0007_backfill_price_snapshot"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dishorder",
+            name="unit_price",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8),
+        ),
+    ]
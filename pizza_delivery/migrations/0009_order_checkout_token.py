@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0008_alter_dishorder_unit_price"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="checkout_token",
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+    ]
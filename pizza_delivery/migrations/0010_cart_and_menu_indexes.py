@@ -0,0 +1,42 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+import pizza_delivery.operations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("pizza_delivery", "0009_order_checkout_token"),
+    ]
+
+    operations = [
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="dish",
+            index=models.Index(fields=["price", "id"], name="dish_price_id_idx"),
+        ),
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="dish",
+            index=models.Index(fields=["name", "id"], name="dish_name_id_idx"),
+        ),
+        # Both are covered by a composite index and only slow down writes
+        migrations.AlterField(
+            model_name="dish",
+            name="name",
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="dishorder",
+            name="order",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="order_dishes",
+                to="pizza_delivery.order",
+            ),
+        ),
+    ]
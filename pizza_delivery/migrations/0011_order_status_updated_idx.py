@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+import pizza_delivery.operations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("pizza_delivery", "0010_cart_and_menu_indexes"),
+    ]
+
+    operations = [
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["status", "updated_at"], name="order_status_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0011_order_status_updated_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedOrder",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("approved", "Approved"),
+                            ("canceled", "Canceled"),
+                            ("delivered", "Delivered"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("asked_date_delivery", models.DateTimeField(blank=True, null=True)),
+                ("name", models.CharField(blank=True, max_length=64, null=True)),
+                (
+                    "phone_number",
+                    phonenumber_field.modelfields.PhoneNumberField(
+                        blank=True, max_length=128, null=True, region=None
+                    ),
+                ),
+                ("email", models.EmailField(blank=True, max_length=64, null=True)),
+                ("address", models.CharField(blank=True, max_length=255, null=True)),
+                ("total_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_orders",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-created_at",),
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedDishOrder",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("dish_name", models.CharField(max_length=64)),
+                ("dish_amount", models.IntegerField()),
+                ("unit_price", models.DecimalField(decimal_places=2, max_digits=8)),
+                (
+                    "dish",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_dish_orders",
+                        to="pizza_delivery.dish",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="order_dishes",
+                        to="pizza_delivery.archivedorder",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archivedorder",
+            index=models.Index(
+                fields=["created_at"], name="archived_order_created_idx"
+            ),
+        ),
+    ]
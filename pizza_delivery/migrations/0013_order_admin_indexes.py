@@ -0,0 +1,39 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+import pizza_delivery.operations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("pizza_delivery", "0012_order_archive"),
+    ]
+
+    operations = [
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at", "id"], name="order_created_id_idx"
+            ),
+        ),
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["phone_number"],
+                name="order_phone_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["email"],
+                name="order_email_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.13 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0013_order_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderStatusChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "from_status",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("approved", "Approved"),
+                            ("canceled", "Canceled"),
+                            ("delivered", "Delivered"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                (
+                    "to_status",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("approved", "Approved"),
+                            ("canceled", "Canceled"),
+                            ("delivered", "Delivered"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "changed_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="order_status_changes",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="status_changes",
+                        to="pizza_delivery.order",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-changed_at",),
+                "indexes": [
+                    models.Index(
+                        fields=["order", "changed_at"], name="status_change_order_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.13 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0014_order_status_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyDishSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("dish_name", models.CharField(max_length=64)),
+                ("quantity", models.PositiveIntegerField()),
+                ("revenue", models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                "ordering": ("day", "dish_name"),
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyStatusSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("approved", "Approved"),
+                            ("canceled", "Canceled"),
+                            ("delivered", "Delivered"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("orders", models.PositiveIntegerField()),
+                ("revenue", models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                "ordering": ("day", "status"),
+            },
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=32, primary_key=True, serialize=False),
+                ),
+                ("value", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dailystatussales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "status"), name="unique_status_per_day"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailydishsales",
+            name="dish",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="daily_sales",
+                to="pizza_delivery.dish",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailydishsales",
+            index=models.Index(fields=["day"], name="daily_dish_sales_day_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dailydishsales",
+            index=models.Index(
+                fields=["dish_name", "day"], name="daily_dish_sales_name_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+def create_menu_version(apps, schema_editor):
+    VersionCounter = apps.get_model("pizza_delivery", "VersionCounter")
+    # Seeded so bumping the menu version is always a plain UPDATE
+    VersionCounter.objects.get_or_create(name="menu")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0015_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersionCounter",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=32, primary_key=True, serialize=False),
+                ),
+                ("value", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(
+            create_menu_version, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.13 on 2026-10-18 13:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0016_version_counter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dish",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="versioncounter",
+            name="changed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
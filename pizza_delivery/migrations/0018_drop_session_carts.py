@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2026-10-18 14:10
+
+from django.db import migrations
+
+
+def delete_session_carts(apps, schema_editor):
+    Order = apps.get_model("pizza_delivery", "Order")
+    # Open orders of anonymous visitors can't be reached any more, their
+    # carts moved into the session
+    Order.objects.filter(status="created", customer__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pizza_delivery", "0017_dish_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_session_carts, migrations.RunPython.noop
+        ),
+        migrations.RemoveConstraint(
+            model_name="order",
+            name="unique_open_order_per_session",
+        ),
+        migrations.RemoveField(
+            model_name="order",
+            name="session_key",
+        ),
+    ]
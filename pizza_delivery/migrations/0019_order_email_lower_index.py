@@ -0,0 +1,30 @@
+# Generated by Django 4.2.13 on 2026-10-18 14:20
+
+from django.db import migrations
+import django.db.models.functions.text
+
+import pizza_delivery.indexes
+import pizza_delivery.operations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("pizza_delivery", "0018_drop_session_carts"),
+    ]
+
+    operations = [
+        pizza_delivery.operations.AddIndexConcurrently(
+            model_name="order",
+            index=pizza_delivery.indexes.PatternOpsIndex(
+                django.db.models.functions.text.Lower("email"),
+                name="order_email_lower_prefix_idx",
+            ),
+        ),
+        pizza_delivery.operations.RemoveIndexConcurrently(
+            model_name="order",
+            name="order_email_prefix_idx",
+        ),
+    ]
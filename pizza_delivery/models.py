@@ -2,11 +2,16 @@ from decimal import Decimal
 
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Lower
 from django.http import HttpResponse
 from django.urls import reverse
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from pizza_delivery.indexes import PatternOpsIndex
+
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=64, db_index=True)
@@ -19,8 +24,26 @@ class Ingredient(models.Model):
         return self.name
 
 
+# SQLite hands back computed decimals without their scale
+CENTS = Decimal("0.01")
+
+
+class DishQuerySet(models.QuerySet):
+    def for_menu(self) -> "DishQuerySet":
+        return self.prefetch_related(
+            models.Prefetch(
+                "dish_ingredients",
+                queryset=(
+                    DishIngredient.objects.select_related("ingredient")
+                    .order_by("pk")
+                ),
+                to_attr="menu_ingredients",
+            )
+        )
+
+
 class Dish(models.Model):
-    name = models.CharField(max_length=64, db_index=True)
+    name = models.CharField(max_length=64)
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(
         max_digits=8,
@@ -32,10 +55,35 @@ class Dish(models.Model):
         Ingredient, through="DishIngredient", related_name="dishes", blank=True
     )
     image = models.URLField(null=True, blank=True)
+    # Also touched when the dish's ingredients change
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DishQuerySet.as_manager()
 
     class Meta:
         verbose_name = "dish"
         verbose_name_plural = "dishes"
+        indexes = [
+            # Keyset pagination walks the menu in these orders
+            models.Index(fields=["price", "id"], name="dish_price_id_idx"),
+            models.Index(fields=["name", "id"], name="dish_name_id_idx"),
+        ]
+
+    @property
+    def ingredient_summary(self) -> str:
+        if hasattr(self, "menu_ingredients"):
+            dish_ingredients = self.menu_ingredients
+        else:
+            dish_ingredients = self.dish_ingredients.select_related(
+                "ingredient"
+            ).order_by("pk")
+
+        return ", ".join(
+            f"x{dish_ingredient.quantity} {dish_ingredient.ingredient.name}"
+            if dish_ingredient.quantity > 1
+            else dish_ingredient.ingredient.name
+            for dish_ingredient in dish_ingredients
+        )
 
     def get_absolute_url(self) -> HttpResponse:
         return reverse("pizza_delivery:dish-detail", kwargs={"pk": self.pk})
@@ -57,6 +105,117 @@ class DishIngredient(models.Model):
         unique_together = ("dish", "ingredient")
 
 
+class DishSearchDocument(models.Model):
+    dish = models.OneToOneField(
+        Dish,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    document = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.document
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_item_counts(self) -> "OrderQuerySet":
+        # A correlated subquery is only evaluated for the rows actually
+        # fetched, a JOIN + GROUP BY would aggregate the whole table first
+        item_counts = (
+            DishOrder.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(count=Sum("dish_amount"))
+            .values("count")
+        )
+        return self.annotate(
+            item_count=Coalesce(
+                Subquery(item_counts), 0, output_field=models.IntegerField()
+            )
+        )
+
+    def refresh_totals(self) -> int:
+        # Cart writes go through here, which keeps active carts from
+        # looking abandoned to the reaper
+        return self.update(
+            total_price=self._total_price(), updated_at=timezone.now()
+        )
+
+    def approve(self, **fields) -> int:
+        # Only still open carts are approved, so a repeated submit of the
+        # same cart updates nothing
+        return self.filter(status=Order.Status.CREATED).update(
+            status=Order.Status.APPROVED,
+            total_price=self._total_price(),
+            updated_at=timezone.now(),
+            **fields,
+        )
+
+    def transition(self, status: str, changed_by=None) -> int:
+        """
+        Move every order of the queryset that may reach ``status`` there
+        with one guarded UPDATE and record each move in the status
+        history. Orders in any other status are left alone.
+        """
+        sources = STATUS_TRANSITIONS.get(status)
+        if not sources:
+            raise ValueError(f"Orders can't be moved to {status!r}")
+
+        with transaction.atomic():
+            changes = list(
+                self.filter(status__in=sources)
+                .select_for_update()
+                .order_by("pk")
+                .values_list("pk", "status")
+            )
+            if not changes:
+                return 0
+            now = timezone.now()
+            Order.objects.filter(
+                pk__in=[order_id for order_id, _ in changes],
+                status__in=sources,
+            ).update(status=status, updated_at=now)
+            OrderStatusChange.objects.bulk_create(
+                OrderStatusChange(
+                    order_id=order_id,
+                    from_status=previous,
+                    to_status=status,
+                    changed_by=changed_by,
+                    changed_at=now,
+                )
+                for order_id, previous in changes
+            )
+        return len(changes)
+
+    @staticmethod
+    def _total_price() -> Coalesce:
+        line_totals = (
+            DishOrder.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(total=Sum(F("unit_price") * F("dish_amount")))
+            .values("total")
+        )
+        return Coalesce(
+            Subquery(line_totals),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+
+
+class DishOrderQuerySet(models.QuerySet):
+    def with_line_totals(self) -> "DishOrderQuerySet":
+        return self.annotate(
+            line_price=models.ExpressionWrapper(
+                F("unit_price") * F("dish_amount"),
+                output_field=models.DecimalField(
+                    max_digits=12, decimal_places=2
+                ),
+            )
+        )
+
+
 class Order(models.Model):
     class Status(models.TextChoices):
         CREATED = "created", "Created"
@@ -83,19 +242,55 @@ class Order(models.Model):
         null=True,
         blank=True,
     )
-    session_key = models.CharField(
-        max_length=32, null=True, blank=True, db_index=True
+    # Identifies the session cart an order was checked out from
+    checkout_token = models.CharField(
+        max_length=32, null=True, blank=True, unique=True
     )
+    # Kept in step with the lines by every cart mutation
+    total_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ("-created_at",)
+        constraints = [
+            # A customer has at most one open cart order, anonymous carts
+            # live in the session until checkout
+            models.UniqueConstraint(
+                fields=["customer"],
+                condition=models.Q(status="created"),
+                name="unique_open_order_per_customer",
+            ),
+        ]
+        indexes = [
+            # Stale cart lookups of the reap_stale_carts command
+            models.Index(
+                fields=["status", "updated_at"],
+                name="order_status_updated_idx",
+            ),
+            # Admin changelist order and date hierarchy
+            models.Index(
+                fields=["created_at", "id"], name="order_created_id_idx"
+            ),
+            # Prefix searches of the admin, pattern_ops lets PostgreSQL
+            # use them for LIKE 'prefix%'
+            models.Index(
+                fields=["phone_number"],
+                name="order_phone_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            # Emails keep the case they were typed in, searches compare
+            # them lowercased
+            PatternOpsIndex(
+                Lower("email"), name="order_email_lower_prefix_idx"
+            ),
+        ]
 
     @property
     def order_price(self) -> Decimal:
-        total_price = Decimal("0.00")
-        for order_dish in self.order_dishes.all():
-            total_price += order_dish.dish.price * order_dish.dish_amount
-        return total_price
+        return self.total_price.quantize(CENTS)
 
     def __str__(self):
         return (
@@ -106,13 +301,215 @@ class Order(models.Model):
 
 
 class DishOrder(models.Model):
+    # Lookups by order use the (order, dish) unique index
     order = models.ForeignKey(
-        Order, on_delete=models.CASCADE, related_name="order_dishes"
+        Order,
+        on_delete=models.CASCADE,
+        related_name="order_dishes",
+        db_index=False,
     )
     dish = models.ForeignKey(
         Dish, on_delete=models.CASCADE, related_name="dish_orders"
     )
     dish_amount = models.IntegerField(default=1)
+    # Dish price at the moment the line was added to the cart
+    unit_price = models.DecimalField(
+        max_digits=8, decimal_places=2, blank=True
+    )
+
+    objects = DishOrderQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "dish"], name="unique_dish_per_order"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.dish.price
+        super().save(*args, **kwargs)
+
+
+# Statuses an order may be moved to in bulk and the ones it may come from,
+# orders only get approved through checkout
+STATUS_TRANSITIONS = {
+    Order.Status.DELIVERED: (Order.Status.APPROVED,),
+    Order.Status.CANCELED: (Order.Status.APPROVED,),
+}
+
+
+class OrderStatusChange(models.Model):
+    # No database constraint, history stays when orders are archived
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        related_name="status_changes",
+        db_constraint=False,
+    )
+    from_status = models.CharField(
+        max_length=15, choices=Order.Status.choices
+    )
+    to_status = models.CharField(max_length=15, choices=Order.Status.choices)
+    changed_by = models.ForeignKey(
+        "Customer",
+        on_delete=models.SET_NULL,
+        related_name="order_status_changes",
+        null=True,
+        blank=True,
+    )
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("-changed_at",)
+        indexes = [
+            models.Index(
+                fields=["order", "changed_at"],
+                name="status_change_order_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+        )
+
+
+class ArchivedOrder(models.Model):
+    """
+    Delivered or canceled order moved out of the live ``Order`` table by
+    the archive_orders command. Keeps the original primary key.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    status = models.CharField(max_length=15, choices=Order.Status.choices)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    asked_date_delivery = models.DateTimeField(blank=True, null=True)
+    name = models.CharField(max_length=64, blank=True, null=True)
+    phone_number = PhoneNumberField(blank=True, null=True)
+    email = models.EmailField(max_length=64, blank=True, null=True)
+    address = models.CharField(max_length=255, blank=True, null=True)
+    customer = models.ForeignKey(
+        "Customer",
+        on_delete=models.SET_NULL,
+        related_name="archived_orders",
+        null=True,
+        blank=True,
+    )
+    total_price = models.DecimalField(max_digits=12, decimal_places=2)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["created_at"], name="archived_order_created_idx"
+            ),
+        ]
+
+    @property
+    def order_price(self) -> Decimal:
+        return self.total_price.quantize(CENTS)
+
+    def __str__(self):
+        return f"Archived order #{self.pk}, status: {self.status}"
+
+
+class ArchivedDishOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder, on_delete=models.CASCADE, related_name="order_dishes"
+    )
+    # History outlives the menu, the name is kept in case the dish goes
+    dish = models.ForeignKey(
+        Dish,
+        on_delete=models.SET_NULL,
+        related_name="archived_dish_orders",
+        null=True,
+        blank=True,
+    )
+    dish_name = models.CharField(max_length=64)
+    dish_amount = models.IntegerField()
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    def __str__(self):
+        return f"x{self.dish_amount} {self.dish_name}"
+
+
+class DailyDishSales(models.Model):
+    """
+    Units and revenue of one dish on one day, over approved and delivered
+    orders. Maintained by the rollup_sales command, see rollups.py.
+    """
+
+    day = models.DateField()
+    # Rollups outlive the menu like archived lines do
+    dish = models.ForeignKey(
+        Dish,
+        on_delete=models.SET_NULL,
+        related_name="daily_sales",
+        null=True,
+        blank=True,
+        db_constraint=False,
+    )
+    dish_name = models.CharField(max_length=64)
+    quantity = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        ordering = ("day", "dish_name")
+        indexes = [
+            models.Index(fields=["day"], name="daily_dish_sales_day_idx"),
+            models.Index(
+                fields=["dish_name", "day"],
+                name="daily_dish_sales_name_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: x{self.quantity} {self.dish_name}"
+
+
+class DailyStatusSales(models.Model):
+    """Orders and their total value per status and day."""
+
+    day = models.DateField()
+    status = models.CharField(max_length=15, choices=Order.Status.choices)
+    orders = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        ordering = ("day", "status")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "status"], name="unique_status_per_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} {self.status} orders"
+
+
+class RollupWatermark(models.Model):
+    # Orders updated before ``value`` are already part of the rollup
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class VersionCounter(models.Model):
+    # Bumped on every change of what it versions, workers compare it with
+    # the version of their local copy
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
 
 
 class Customer(AbstractUser):
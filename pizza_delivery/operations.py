@@ -0,0 +1,52 @@
+from django.contrib.postgres import operations
+from django.db.migrations.operations import AddIndex, RemoveIndex
+
+
+class ConcurrentOnPostgreSQL:
+    """
+    Runs the concurrent index operation on PostgreSQL so the table keeps
+    taking writes, other backends get the plain ``fallback`` operation.
+    Migrations using it must set ``atomic = False``.
+    """
+
+    fallback = None
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            self.fallback.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            self.fallback.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class AddIndexConcurrently(
+    ConcurrentOnPostgreSQL, operations.AddIndexConcurrently
+):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL, a plain AddIndex elsewhere."""
+
+    fallback = AddIndex
+
+
+class RemoveIndexConcurrently(
+    ConcurrentOnPostgreSQL, operations.RemoveIndexConcurrently
+):
+    """DROP INDEX CONCURRENTLY on PostgreSQL, a plain RemoveIndex elsewhere."""
+
+    fallback = RemoveIndex
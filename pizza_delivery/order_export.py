@@ -0,0 +1,122 @@
+import csv
+import json
+from typing import Iterator
+
+from django.db.models import F, Prefetch
+
+from pizza_delivery.models import (
+    CENTS,
+    ArchivedDishOrder,
+    ArchivedOrder,
+    DishOrder,
+    Order,
+)
+
+EXPORT_BATCH_SIZE = 1000
+# Open carts aren't orders yet and never leave the shop
+EXPORT_STATUSES = [
+    status for status in Order.Status if status != Order.Status.CREATED
+]
+ORDER_COLUMNS = [
+    "order_id",
+    "status",
+    "created_at",
+    "name",
+    "phone_number",
+    "email",
+    "total_price",
+]
+LINE_COLUMNS = [
+    "dish_id",
+    "dish_name",
+    "dish_amount",
+    "unit_price",
+    "line_price",
+]
+
+
+def export_orders(
+    filters: dict, batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[dict]:
+    """
+    Archived and then live orders matching ``filters``, each with its
+    lines, oldest first. Rows are read in batches of ``batch_size``
+    through ``iterator()``, one query for the orders and one for their
+    lines per batch.
+    """
+    archived = ArchivedOrder.objects.filter(**filters).order_by(
+        "created_at", "pk"
+    ).prefetch_related(
+        Prefetch(
+            "order_dishes",
+            queryset=ArchivedDishOrder.objects.order_by("pk"),
+            to_attr="export_lines",
+        )
+    )
+    live = Order.objects.filter(**filters).order_by(
+        "created_at", "pk"
+    ).prefetch_related(
+        Prefetch(
+            "order_dishes",
+            queryset=DishOrder.objects.annotate(
+                dish_name=F("dish__name")
+            ).order_by("pk"),
+            to_attr="export_lines",
+        )
+    )
+    for orders in (archived, live):
+        for order in orders.iterator(chunk_size=batch_size):
+            yield order_record(order)
+
+
+def order_record(order: Order | ArchivedOrder) -> dict:
+    return {
+        "order_id": order.pk,
+        "status": order.status,
+        "created_at": order.created_at.isoformat(),
+        "name": order.name,
+        "phone_number": str(order.phone_number or "") or None,
+        "email": order.email,
+        "total_price": str(order.total_price.quantize(CENTS)),
+        "lines": [
+            {
+                "dish_id": line.dish_id,
+                "dish_name": line.dish_name,
+                "dish_amount": line.dish_amount,
+                "unit_price": str(line.unit_price.quantize(CENTS)),
+                "line_price": str(
+                    (line.unit_price * line.dish_amount).quantize(CENTS)
+                ),
+            }
+            for line in order.export_lines
+        ],
+    }
+
+
+def ndjson_chunks(records: Iterator[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class Echo:
+    """File-like object handing written CSV rows straight back."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_chunks(records: Iterator[dict]) -> Iterator[str]:
+    # One row per order line, orders without lines get a single row
+    writer = csv.writer(Echo())
+    yield writer.writerow([*ORDER_COLUMNS, *LINE_COLUMNS])
+    for record in records:
+        order_values = [record[column] for column in ORDER_COLUMNS]
+        if not record["lines"]:
+            yield writer.writerow(order_values)
+            continue
+        yield "".join(
+            writer.writerow(
+                order_values + [line[column] for column in LINE_COLUMNS]
+            )
+            for line in record["lines"]
+        )
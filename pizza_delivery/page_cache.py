@@ -0,0 +1,117 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable
+from urllib.parse import urlencode
+
+from django.contrib import messages
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+from pizza_delivery.caching import tiered_cache
+from pizza_delivery.cart import SessionCart
+from pizza_delivery.catalog import get_menu
+
+# Pages are keyed on the menu version, the timeout only bounds how long
+# a template change takes to show up
+PAGE_TTL = 10 * 60
+
+
+class UncacheablePage(Exception):
+    def __init__(self, response: HttpResponse) -> None:
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def normalized_query(request: HttpRequest) -> str:
+    # Parameter order and empty parameters don't change the page
+    return urlencode(
+        sorted(
+            (key, value)
+            for key, values in request.GET.lists()
+            for value in values
+            if value
+        )
+    )
+
+
+def page_cache_bypassed(request: HttpRequest) -> bool:
+    # Anything only this visitor sees, their cart, account or pending
+    # messages, rules out the shared copy
+    return (
+        request.user.is_authenticated
+        or bool(SessionCart(request.session).lines)
+        or bool(messages.get_messages(request))
+    )
+
+
+def cache_anonymous_page(
+    last_modified: Callable[..., datetime | None] | None = None,
+) -> Callable:
+    """
+    Serve a view's GET responses to anonymous visitors with an empty cart
+    from the tiered cache, keyed on the path, the normalized query string
+    and the menu version. Responses carry a strong ETag of the content
+    and ``last_modified(request, *args, **kwargs)``, the time of
+    rendering when it is missing or returns None, repeat requests get a
+    304 without rendering.
+    Pages must not embed a CSRF token, see ``ensure_csrf_cookie``.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in ("GET", "HEAD") or page_cache_bypassed(
+                request
+            ):
+                return view(request, *args, **kwargs)
+
+            def render() -> tuple:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, "render"):
+                    response.render()
+                if response.status_code != 200 or response.streaming:
+                    raise UncacheablePage(response)
+                modified = (
+                    last_modified and last_modified(request, *args, **kwargs)
+                ) or timezone.now()
+                return (
+                    response.content,
+                    response["Content-Type"],
+                    f'"{hashlib.sha1(response.content).hexdigest()}"',
+                    int(modified.timestamp()),
+                )
+
+            try:
+                content, content_type, etag, modified = (
+                    tiered_cache.get_or_set(
+                        "page",
+                        (request.path, normalized_query(request)),
+                        get_menu().version,
+                        render,
+                        PAGE_TTL,
+                    )
+                )
+            except UncacheablePage as uncacheable:
+                return uncacheable.response
+
+            response = HttpResponse(content, content_type=content_type)
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(modified)
+            # Browsers revalidate every time, a cart or a login changes
+            # what the same URL shows
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Cookie",))
+            return get_conditional_response(
+                request, etag=etag, last_modified=modified, response=response
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,354 @@
+import json
+import math
+from bisect import bisect_right
+from decimal import InvalidOperation
+from typing import Callable, Sequence
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+CURSOR_SALT = "pizza_delivery.pagination"
+# Page links rendered on each side of the current page
+PAGE_WINDOW = 2
+# Above this many rows the exact COUNT(*) is replaced by an estimate
+COUNT_LIMIT = 1000
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def approximate_count(queryset: QuerySet) -> int:
+    counted = queryset.order_by()[:COUNT_LIMIT].count()
+    if counted < COUNT_LIMIT or connection.vendor != "postgresql":
+        return counted
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]["Plan"]["Plan Rows"]), counted)
+
+
+def encode_cursor(values: list, number: int, salt: str) -> str:
+    # Round trip through the Django encoder so Decimals and dates become
+    # plain JSON the ORM accepts back as lookup values
+    values = json.loads(json.dumps(values, cls=DjangoJSONEncoder))
+    # Not timestamped, the same page always links the same cursors and
+    # its cached copy keeps matching
+    return signing.Signer(salt=salt).sign_object(
+        {"after": values, "page": number}, compress=True
+    )
+
+
+def decode_cursor(cursor: str, salt: str) -> tuple[list, int]:
+    try:
+        data = signing.Signer(salt=salt).unsign_object(cursor)
+        return list(data["after"]), max(int(data["page"]), 2)
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+class CursorPage:
+    def __init__(
+        self,
+        object_list: list,
+        number: int,
+        previous_cursors: list,
+        next_cursors: list,
+        count: int | None = None,
+        count_estimated: bool = False,
+    ) -> None:
+        self.object_list = object_list
+        self.number = number
+        # Index 0 is the adjacent page, None stands for the first page
+        self.previous_cursors = previous_cursors
+        self.next_cursors = next_cursors
+        # Total over all pages when known, see approximate_count()
+        self.count = count
+        self.count_estimated = count_estimated
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_previous(self) -> bool:
+        return bool(self.previous_cursors)
+
+    def has_next(self) -> bool:
+        return bool(self.next_cursors)
+
+    @property
+    def previous_cursor(self) -> str | None:
+        return self.previous_cursors[0] if self.previous_cursors else None
+
+    @property
+    def next_cursor(self) -> str | None:
+        return self.next_cursors[0] if self.next_cursors else None
+
+    @property
+    def page_links(self) -> list[dict]:
+        previous_links = [
+            {"number": self.number - offset, "cursor": cursor}
+            for offset, cursor in enumerate(self.previous_cursors, start=1)
+        ]
+        next_links = [
+            {"number": self.number + offset, "cursor": cursor}
+            for offset, cursor in enumerate(self.next_cursors, start=1)
+        ]
+        return [
+            *reversed(previous_links),
+            {"number": self.number, "cursor": None, "current": True},
+            *next_links,
+        ]
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a fixed ``ordering`` that must end with a
+    unique field. Every page costs the same bounded queries however
+    deep it is, there is no COUNT(*) and no OFFSET scan.
+    """
+
+    def __init__(
+        self, queryset: QuerySet, per_page: int, ordering: tuple[str, ...]
+    ) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.field_names = [field.lstrip("-") for field in ordering]
+        # A cursor signed for one ordering is rejected by every other one
+        self.salt = f"{CURSOR_SALT}:{','.join(ordering)}"
+
+    def page(self, cursor: str | None) -> CursorPage:
+        if cursor:
+            try:
+                after, number = decode_cursor(cursor, self.salt)
+            except InvalidCursor:
+                after, number = None, 1
+        else:
+            after, number = None, 1
+
+        ordered = self.queryset.order_by(*self.ordering)
+        if after is not None:
+            ordered = ordered.filter(self._keyset_filter(after))
+        object_list = list(ordered[:self.per_page])
+
+        if not object_list:
+            if after is not None:
+                # Rows behind the cursor are gone, start over
+                return self.page(None)
+            return CursorPage(object_list, number, [], [])
+
+        next_cursors = self._next_cursors(object_list[-1], number)
+        if after is None:
+            return CursorPage(object_list, number, [], next_cursors)
+
+        number, previous_cursors = self._previous_cursors(
+            object_list[0], number
+        )
+        return CursorPage(
+            object_list, number, previous_cursors, next_cursors
+        )
+
+    def approximate_count(self) -> int:
+        return approximate_count(self.queryset)
+
+    def _next_cursors(self, last_object, number: int) -> list[str]:
+        keys = list(
+            self.queryset.order_by(*self.ordering)
+            .filter(self._keyset_filter(self._keys_of(last_object)))
+            .values_list(*self.field_names)[:self.per_page * PAGE_WINDOW]
+        )
+        if not keys:
+            return []
+
+        # Each following page starts right after the last row of the one
+        # before it
+        boundaries = [self._keys_of(last_object)] + [
+            list(keys[end - 1])
+            for end in range(self.per_page, len(keys), self.per_page)
+        ]
+        return [
+            encode_cursor(boundary, number + offset, self.salt)
+            for offset, boundary in enumerate(boundaries, start=1)
+        ]
+
+    def _previous_cursors(
+        self, first_object, number: int
+    ) -> tuple[int, list]:
+        reversed_ordering = [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+        limit = self.per_page * PAGE_WINDOW + 1
+        keys = list(
+            self.queryset.order_by(*reversed_ordering)
+            .filter(
+                self._keyset_filter(self._keys_of(first_object), reverse=True)
+            )
+            .values_list(*self.field_names)[:limit]
+        )
+        if not keys:
+            return 1, []
+        if len(keys) < limit:
+            # Reached the start, page numbers can be recomputed exactly
+            number = math.ceil(len(keys) / self.per_page) + 1
+
+        # Page ``number - offset`` starts right after keys[offset * per_page],
+        # the page that runs out of keys is the first one
+        cursors = []
+        for offset in range(1, PAGE_WINDOW + 1):
+            boundary = offset * self.per_page
+            if boundary < len(keys) and number - offset > 1:
+                cursors.append(
+                    encode_cursor(
+                        list(keys[boundary]), number - offset, self.salt
+                    )
+                )
+            else:
+                cursors.append(None)
+                break
+        return number, cursors
+
+    def _keys_of(self, obj) -> list:
+        return [getattr(obj, name) for name in self.field_names]
+
+    def _keyset_filter(self, values: list, reverse: bool = False) -> Q:
+        keyset = Q()
+        for position, field in enumerate(self.ordering):
+            descending = field.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            name = self.field_names[position]
+            condition = Q(**{f"{name}__{lookup}": values[position]})
+            for name, value in zip(self.field_names[:position], values):
+                condition &= Q(**{name: value})
+            keyset |= condition
+        return keyset
+
+
+def sort_key(values: Sequence, ordering: tuple[str, ...]) -> tuple:
+    # Descending fields must be numeric
+    return tuple(
+        -value if field.startswith("-") else value
+        for value, field in zip(values, ordering)
+    )
+
+
+def ordering_key(ordering: tuple[str, ...]) -> Callable[[object], tuple]:
+    """Python sort key matching ``order_by(*ordering)``."""
+    names = [field.lstrip("-") for field in ordering]
+    return lambda obj: sort_key(
+        [getattr(obj, name) for name in names], ordering
+    )
+
+
+class SequenceCursorPaginator(CursorPaginator):
+    """
+    CursorPaginator over a sequence already sorted by ``ordering``, e.g.
+    the in-memory menu. Pages cost no queries. Python compares strings
+    by code point and the database by its collation, so the cursors are
+    signed apart from the queryset paginator's and each rejects the
+    other's.
+    """
+
+    def __init__(
+        self,
+        items: Sequence,
+        per_page: int,
+        ordering: tuple[str, ...],
+        keys: Sequence[tuple] | None = None,
+    ) -> None:
+        super().__init__(None, per_page, ordering)
+        self.salt = f"{CURSOR_SALT}:sequence:{','.join(ordering)}"
+        self.items = items
+        # Sort keys of ``items``, pass them in when the same sequence is
+        # paged more than once
+        if keys is None:
+            keys = list(map(ordering_key(ordering), items))
+        self.keys = keys
+
+    def page(self, cursor: str | None) -> CursorPage:
+        start = 0
+        if cursor and self.items:
+            try:
+                after, _ = decode_cursor(cursor, self.salt)
+                start = bisect_right(self.keys, self._after_key(after))
+            except (InvalidCursor, TypeError, ValueError, InvalidOperation):
+                start = 0
+
+        object_list = list(self.items[start:start + self.per_page])
+        if not object_list and start:
+            # Rows behind the cursor are gone, start over
+            return self.page(None)
+
+        number = math.ceil(start / self.per_page) + 1
+        next_cursors = []
+        for offset in range(1, PAGE_WINDOW + 1):
+            next_start = start + offset * self.per_page
+            if next_start >= len(self.items):
+                break
+            next_cursors.append(
+                encode_cursor(
+                    self._keys_of(self.items[next_start - 1]),
+                    number + offset,
+                    self.salt,
+                )
+            )
+
+        previous_cursors = []
+        for offset in range(1, PAGE_WINDOW + 1):
+            if not start:
+                break
+            previous_start = start - offset * self.per_page
+            if previous_start <= 0 or number - offset <= 1:
+                previous_cursors.append(None)
+                break
+            previous_cursors.append(
+                encode_cursor(
+                    self._keys_of(self.items[previous_start - 1]),
+                    number - offset,
+                    self.salt,
+                )
+            )
+
+        return CursorPage(
+            object_list,
+            number,
+            previous_cursors,
+            next_cursors,
+            len(self.items),
+        )
+
+    def approximate_count(self) -> int:
+        return len(self.items)
+
+    def _after_key(self, values: list) -> tuple:
+        # Cursor values come back as JSON, cast them to the field types
+        field_types = map(type, self._keys_of(self.items[0]))
+        return sort_key(
+            [
+                field_type(value)
+                for field_type, value in zip(field_types, values)
+            ],
+            self.ordering,
+        )
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large admin changelists, counts exactly up to
+    COUNT_LIMIT rows and estimates past that instead of a full COUNT(*).
+    """
+
+    @cached_property
+    def count(self) -> int:
+        return approximate_count(self.object_list)
@@ -0,0 +1,258 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Min,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Q,
+    QuerySet,
+    Sum,
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from pizza_delivery.models import (
+    CENTS,
+    ArchivedDishOrder,
+    ArchivedOrder,
+    DailyDishSales,
+    DailyStatusSales,
+    DishOrder,
+    Order,
+    RollupWatermark,
+)
+
+WATERMARK_NAME = "sales"
+# Open carts aren't sales, canceled orders only count per status
+ROLLUP_STATUSES = [
+    status for status in Order.Status if status != Order.Status.CREATED
+]
+SOLD_STATUSES = [Order.Status.APPROVED, Order.Status.DELIVERED]
+# Writes committing a moment after the run started may carry an earlier
+# updated_at, the watermark trails the clock so they aren't skipped
+WATERMARK_LAG = timezone.timedelta(minutes=1)
+DAYS_PER_BATCH = 31
+
+
+def rollup_sales(now: timezone.datetime | None = None) -> list[date]:
+    """
+    Rebuild the rollup rows of every day with an order changed since the
+    watermark and move the watermark forward. Returns the days refreshed.
+    """
+    until = (now or timezone.now()) - WATERMARK_LAG
+    with transaction.atomic():
+        watermark = (
+            RollupWatermark.objects.select_for_update()
+            .filter(name=WATERMARK_NAME)
+            .first()
+        )
+        changed = Order.objects.filter(
+            status__in=ROLLUP_STATUSES, updated_at__lt=until
+        )
+        if watermark is not None:
+            changed = changed.filter(updated_at__gte=watermark.value)
+        days = sorted(
+            changed.annotate(day=TruncDate("created_at"))
+            .order_by()
+            .values_list("day", flat=True)
+            .distinct()
+        )
+        refresh_days(days)
+        RollupWatermark.objects.update_or_create(
+            name=WATERMARK_NAME, defaults={"value": until}
+        )
+    return days
+
+
+def rebuild_sales(now: timezone.datetime | None = None) -> list[date]:
+    """Recompute every day from the first order to today."""
+    until = (now or timezone.now()) - WATERMARK_LAG
+    first_orders = [
+        orders.filter(status__in=ROLLUP_STATUSES).aggregate(
+            first=Min("created_at")
+        )["first"]
+        for orders in (Order.objects.all(), ArchivedOrder.objects.all())
+    ]
+    # Days rolled up before their orders were deleted are cleared as well
+    days = {
+        day
+        for rollups in (DailyStatusSales, DailyDishSales)
+        for day in rollups.objects.order_by()
+        .values_list("day", flat=True)
+        .distinct()
+    }
+    first_orders = [moment for moment in first_orders if moment is not None]
+    if first_orders:
+        day = timezone.localdate(min(first_orders))
+        while day <= timezone.localdate(until):
+            days.add(day)
+            day += timezone.timedelta(days=1)
+
+    refresh_days(days)
+    RollupWatermark.objects.update_or_create(
+        name=WATERMARK_NAME, defaults={"value": until}
+    )
+    return sorted(days)
+
+
+def refresh_days(days: Iterable[date]) -> None:
+    """
+    Recompute the rollup rows of ``days`` from live and archived orders,
+    DAYS_PER_BATCH days per transaction.
+    """
+    days = sorted(set(days))
+    for start in range(0, len(days), DAYS_PER_BATCH):
+        with transaction.atomic():
+            _refresh_days(days[start:start + DAYS_PER_BATCH])
+
+
+def _refresh_days(days: list[date]) -> None:
+    # Orders count on the local day they were created
+    dish_sales = defaultdict(lambda: [0, Decimal("0.00")])
+    status_sales = defaultdict(lambda: [0, Decimal("0.00")])
+
+    for lines in (
+        DishOrder.objects.annotate(dish_name=F("dish__name")),
+        ArchivedDishOrder.objects.all(),
+    ):
+        rows = (
+            lines.filter(
+                _created_on(days, "order__created_at"),
+                order__status__in=SOLD_STATUSES,
+            )
+            .annotate(day=TruncDate("order__created_at"))
+            .order_by()
+            .values_list("day", "dish_id", "dish_name")
+            .annotate(
+                quantity=Sum("dish_amount"),
+                revenue=Sum(
+                    ExpressionWrapper(
+                        F("unit_price") * F("dish_amount"),
+                        output_field=DecimalField(
+                            max_digits=14, decimal_places=2
+                        ),
+                    )
+                ),
+            )
+        )
+        for day, dish_id, dish_name, quantity, revenue in rows:
+            totals = dish_sales[day, dish_id, dish_name]
+            totals[0] += quantity
+            totals[1] += revenue
+
+    for orders in (Order.objects.all(), ArchivedOrder.objects.all()):
+        rows = (
+            orders.filter(
+                _created_on(days, "created_at"), status__in=ROLLUP_STATUSES
+            )
+            .annotate(day=TruncDate("created_at"))
+            .order_by()
+            .values_list("day", "status")
+            .annotate(count=Count("pk"), revenue=Sum("total_price"))
+        )
+        for day, status, count, revenue in rows:
+            totals = status_sales[day, status]
+            totals[0] += count
+            totals[1] += revenue
+
+    DailyDishSales.objects.filter(day__in=days).delete()
+    DailyStatusSales.objects.filter(day__in=days).delete()
+    DailyDishSales.objects.bulk_create(
+        DailyDishSales(
+            day=day,
+            dish_id=dish_id,
+            dish_name=dish_name or "",
+            quantity=quantity,
+            revenue=revenue.quantize(CENTS),
+        )
+        for (day, dish_id, dish_name), (quantity, revenue) in sorted(
+            dish_sales.items(), key=lambda item: (item[0][0], item[0][2])
+        )
+    )
+    DailyStatusSales.objects.bulk_create(
+        DailyStatusSales(
+            day=day,
+            status=status,
+            orders=count,
+            revenue=revenue.quantize(CENTS),
+        )
+        for (day, status), (count, revenue) in sorted(status_sales.items())
+    )
+
+
+def _created_on(days: list[date], field: str) -> Q:
+    # Runs of consecutive days become one range each, ranges keep the
+    # created_at indexes usable where __date lookups convert every row
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timezone.timedelta(days=1)
+        else:
+            ranges.append([day, day + timezone.timedelta(days=1)])
+
+    condition = Q()
+    for start, end in ranges:
+        condition |= Q(
+            **{
+                f"{field}__gte": _start_of(start),
+                f"{field}__lt": _start_of(end),
+            }
+        )
+    return condition
+
+
+def _start_of(day: date) -> timezone.datetime:
+    return timezone.make_aware(
+        timezone.datetime.combine(day, timezone.datetime.min.time())
+    )
+
+
+def sales_by_status(date_from: date, date_to: date) -> QuerySet:
+    return DailyStatusSales.objects.filter(day__range=(date_from, date_to))
+
+
+def status_report(date_from: date, date_to: date) -> dict:
+    # One row per day with (orders, revenue) for each of ROLLUP_STATUSES
+    empty = (0, Decimal("0.00"))
+    days = defaultdict(dict)
+    for sales in sales_by_status(date_from, date_to):
+        days[sales.day][sales.status] = (sales.orders, sales.revenue)
+
+    rows = [
+        {
+            "day": day,
+            "statuses": [
+                days[day].get(status, empty) for status in ROLLUP_STATUSES
+            ],
+        }
+        for day in sorted(days)
+    ]
+    totals = [
+        (
+            sum(row["statuses"][index][0] for row in rows),
+            sum(
+                (row["statuses"][index][1] for row in rows), Decimal("0.00")
+            ),
+        )
+        for index in range(len(ROLLUP_STATUSES))
+    ]
+    return {"statuses": ROLLUP_STATUSES, "days": rows, "totals": totals}
+
+
+def daily_dish_sales(date_from: date, date_to: date) -> QuerySet:
+    return DailyDishSales.objects.filter(day__range=(date_from, date_to))
+
+
+def sales_by_dish(date_from: date, date_to: date) -> QuerySet:
+    return (
+        daily_dish_sales(date_from, date_to)
+        .values("dish_name")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("-quantity", "dish_name")
+    )
@@ -0,0 +1,125 @@
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import FloatField, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+from pizza_delivery.models import Dish, DishSearchDocument
+
+SEARCH_TABLE = DishSearchDocument._meta.db_table
+FTS_TABLE = f"{SEARCH_TABLE}_fts"
+DISH_TABLE = Dish._meta.db_table
+
+# Trigram tokenizer can't match anything shorter than one trigram
+FTS_MIN_QUERY_LENGTH = 3
+REFRESH_BATCH_SIZE = 1000
+
+
+def build_search_document(dish: Dish) -> str:
+    ingredient_names = [
+        dish_ingredient.ingredient.name
+        for dish_ingredient in dish.menu_ingredients
+    ]
+    return " ".join([dish.name, *ingredient_names])
+
+
+def refresh_search_documents(dish_ids: Iterable[int] | None = None) -> int:
+    dishes = Dish.objects.for_menu().order_by("pk")
+    if dish_ids is None:
+        return _refresh_dishes(dishes)
+
+    dish_ids = list(dish_ids)
+    return sum(
+        _refresh_dishes(
+            dishes.filter(pk__in=dish_ids[start:start + REFRESH_BATCH_SIZE])
+        )
+        for start in range(0, len(dish_ids), REFRESH_BATCH_SIZE)
+    )
+
+
+def _refresh_dishes(dishes: QuerySet) -> int:
+    refreshed = 0
+    documents = []
+    for dish in dishes.iterator(chunk_size=REFRESH_BATCH_SIZE):
+        documents.append(
+            DishSearchDocument(dish=dish, document=build_search_document(dish))
+        )
+        if len(documents) >= REFRESH_BATCH_SIZE:
+            refreshed += _save_search_documents(documents)
+            documents = []
+
+    return refreshed + _save_search_documents(documents)
+
+
+def _save_search_documents(documents: list[DishSearchDocument]) -> int:
+    DishSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=["dish"],
+        update_fields=["document"],
+    )
+    return len(documents)
+
+
+def search_dishes(dishes: QuerySet, query: str) -> QuerySet:
+    query = query.strip()
+    if not query:
+        return dishes
+
+    if connection.vendor == "sqlite" and len(query) >= FTS_MIN_QUERY_LENGTH:
+        dishes = _sqlite_search(dishes, query)
+    elif connection.vendor == "postgresql":
+        dishes = _postgresql_search(dishes, query)
+    else:
+        dishes = dishes.filter(
+            search_document__document__icontains=query
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return dishes.order_by("-search_rank", "name", "pk")
+
+
+def _sqlite_search(dishes: QuerySet, query: str) -> QuerySet:
+    # Quote the whole query as one FTS5 string so user input can't
+    # inject MATCH syntax, trigram tokens keep substring semantics.
+    # Joining the FTS table lets it drive the plan and score each
+    # match once, a correlated bm25() subquery would rescan per row
+    match = '"{}"'.format(query.replace('"', '""'))
+    return dishes.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f"{FTS_TABLE}.rowid = {DISH_TABLE}.id",
+            f"{FTS_TABLE} MATCH %s",
+        ],
+        params=[match],
+    ).annotate(
+        search_rank=RawSQL(
+            f"-bm25({FTS_TABLE})", [], output_field=FloatField()
+        )
+    )
+
+
+def _postgresql_search(dishes: QuerySet, query: str) -> QuerySet:
+    # Whole words hit the GIN tsvector index, partial words such as
+    # "rella" fall back to the trigram index on the same document
+    return dishes.filter(
+        pk__in=RawSQL(
+            f"SELECT dish_id FROM {SEARCH_TABLE} "
+            f"WHERE search_vector @@ websearch_to_tsquery('simple', %s) "
+            f"OR document ILIKE %s",
+            [query, f"%{_escape_like(query)}%"],
+        )
+    ).annotate(
+        search_rank=RawSQL(
+            f"SELECT ts_rank(search_vector, "
+            f"websearch_to_tsquery('simple', %s)) "
+            f"FROM {SEARCH_TABLE} WHERE dish_id = {DISH_TABLE}.id",
+            [query],
+            output_field=FloatField(),
+        )
+    )
+
+
+def _escape_like(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
@@ -0,0 +1,70 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from pizza_delivery.cart import move_session_cart
+from pizza_delivery.catalog import bump_menu_version
+from pizza_delivery.models import Dish, DishIngredient, Ingredient
+from pizza_delivery.search import refresh_search_documents
+
+
+@receiver(post_save, sender=Dish)
+def refresh_dish_search_document(sender, instance, **kwargs) -> None:
+    refresh_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search_documents(sender, instance, **kwargs) -> None:
+    refresh_search_documents(
+        instance.ingredient_dishes.values_list("dish_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=DishIngredient)
+@receiver(post_delete, sender=DishIngredient)
+def refresh_dish_ingredient_search_document(
+    sender, instance, origin=None, **kwargs
+) -> None:
+    # The dish itself is being deleted, its document goes with it
+    if isinstance(origin, Dish) or (
+        isinstance(origin, QuerySet) and origin.model is Dish
+    ):
+        return
+    refresh_search_documents([instance.dish_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_dishes(sender, instance, created, **kwargs) -> None:
+    if created:
+        return
+    Dish.objects.filter(ingredients=instance).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=DishIngredient)
+@receiver(post_delete, sender=DishIngredient)
+def touch_dish(sender, instance, **kwargs) -> None:
+    # A deleted dish matches no row, nothing to touch
+    Dish.objects.filter(pk=instance.dish_id).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=DishIngredient)
+@receiver(post_delete, sender=DishIngredient)
+def invalidate_menu_snapshots(sender, **kwargs) -> None:
+    bump_menu_version()
+
+
+@receiver(user_logged_in)
+def move_session_cart_to_customer(sender, request, user, **kwargs) -> None:
+    # Whatever was added before logging in joins the customer's own cart
+    if request is not None:
+        move_session_cart(request.session, user)
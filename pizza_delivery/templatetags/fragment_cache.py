@@ -0,0 +1,61 @@
+from django import template
+from django.http import HttpRequest
+from django.utils.safestring import mark_safe
+
+from pizza_delivery.caching import tiered_cache
+from pizza_delivery.cart import get_cart
+
+# Keys carry the versions, the timeout only bounds how long an entry
+# outlives changes made behind the cart classes' back
+FRAGMENT_TTL = 5 * 60
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, namespace, key_parts) -> None:
+        self.nodelist = nodelist
+        self.namespace = namespace
+        self.key_parts = key_parts
+
+    def render(self, context) -> str:
+        key = tuple(part.resolve(context) for part in self.key_parts)
+        return mark_safe(
+            tiered_cache.get_or_set(
+                self.namespace.resolve(context),
+                key,
+                0,
+                lambda: self.nodelist.render(context),
+                FRAGMENT_TTL,
+            )
+        )
+
+
+@register.tag
+def cached_fragment(parser, token):
+    """
+    {% cached_fragment "dish-card" dish.id dish.version %}
+        ...
+    {% endcached_fragment %}
+
+    Renders the contents once per distinct key in the tiered cache. The
+    key must cover everything the output depends on, e.g. a version, and
+    nothing that differs per visitor such as the CSRF token.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]!r} takes a namespace and at least one key part"
+        )
+    nodelist = parser.parse(("endcached_fragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
+
+
+@register.filter
+def cart_key(request: HttpRequest) -> tuple:
+    return get_cart(request).fragment_key()
@@ -0,0 +1,95 @@
+import datetime
+
+from django import template
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def date_title(moment, date_format: str) -> str:
+    return capfirst(formats.date_format(moment, date_format))
+
+
+@register.inclusion_tag("admin/date_hierarchy.html")
+def probed_date_hierarchy(cl) -> dict:
+    """
+    The admin's ``date_hierarchy`` for a ProbedDatesChangeList, it takes
+    the date range and the periods with rows from the changelist instead
+    of aggregating the whole changelist query.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f"{field_name}__year"
+    month_field = f"{field_name}__month"
+    day_field = f"{field_name}__day"
+    year = cl.params.get(year_field)
+    month = cl.params.get(month_field)
+    day = cl.params.get(day_field)
+
+    def link(filters: dict) -> str:
+        return cl.get_query_string(filters, [f"{field_name}__"])
+
+    if not (year or month or day):
+        # Start at the narrowest level that holds every row
+        first, last = cl.date_bounds()
+        if first is not None:
+            first, last = timezone.localtime(first), timezone.localtime(last)
+            if first.year == last.year:
+                year = first.year
+                if first.month == last.month:
+                    month = first.month
+
+    if year and month and day:
+        moment = datetime.date(int(year), int(month), int(day))
+        return {
+            "show": True,
+            "back": {
+                "link": link({year_field: year, month_field: month}),
+                "title": date_title(moment, "YEAR_MONTH_FORMAT"),
+            },
+            "choices": [{"title": date_title(moment, "MONTH_DAY_FORMAT")}],
+        }
+    if year and month:
+        return {
+            "show": True,
+            "back": {"link": link({year_field: year}), "title": str(year)},
+            "choices": [
+                {
+                    "link": link(
+                        {
+                            year_field: year,
+                            month_field: month,
+                            day_field: period.day,
+                        }
+                    ),
+                    "title": date_title(period, "MONTH_DAY_FORMAT"),
+                }
+                for period in cl.date_periods("day")
+            ],
+        }
+    if year:
+        return {
+            "show": True,
+            "back": {"link": link({}), "title": _("All dates")},
+            "choices": [
+                {
+                    "link": link(
+                        {year_field: year, month_field: period.month}
+                    ),
+                    "title": date_title(period, "YEAR_MONTH_FORMAT"),
+                }
+                for period in cl.date_periods("month")
+            ],
+        }
+    return {
+        "show": True,
+        "back": None,
+        "choices": [
+            {
+                "link": link({year_field: str(period.year)}),
+                "title": str(period.year),
+            }
+            for period in cl.date_periods("year")
+        ],
+    }
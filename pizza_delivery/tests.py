@@ -1,15 +1,91 @@
+import json
+import os
+import re
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django import test
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.test import Client, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import http_date
 
+from pizza_delivery import catalog
+from pizza_delivery.archive import order_history
+from pizza_delivery.caching import TieredCache, make_key, tiered_cache
+from pizza_delivery.cart import (
+    CartBusy,
+    DatabaseCart,
+    SessionCart,
+    add_to_cart,
+    order_approved,
+    remove_from_cart,
+)
 from pizza_delivery.models import (
+    ArchivedDishOrder,
+    ArchivedOrder,
+    DailyDishSales,
+    DailyStatusSales,
     Dish,
     Order,
+    OrderStatusChange,
     DishOrder,
     Ingredient,
     DishIngredient,
+    VersionCounter,
+)
+from pizza_delivery.menu_io import (
+    MenuImportError,
+    export_menu,
+    import_menu,
+    read_csv,
+    read_jsonl,
+    write_csv,
+    write_jsonl,
+)
+from pizza_delivery.pagination import (
+    CursorPaginator,
+    SequenceCursorPaginator,
+    decode_cursor,
 )
+from pizza_delivery.rollups import (
+    WATERMARK_LAG,
+    rebuild_sales,
+    rollup_sales,
+)
+from pizza_delivery.search import search_dishes
+
+
+class ResetCachesMixin:
+    # Cached entries would outlive the rolled back rows they were built
+    # from, and versions restart with the database
+    def _pre_setup(self):
+        super()._pre_setup()
+        for cache in caches.all():
+            cache.clear()
+        tiered_cache.clear()
+        catalog.menu_cache.clear()
+
+
+class TestCase(ResetCachesMixin, test.TestCase):
+    pass
+
+
+class TransactionTestCase(ResetCachesMixin, test.TransactionTestCase):
+    pass
 
 
 class PizzaDeliveryTests(TestCase):
@@ -273,3 +349,2421 @@ class IndexSearchTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Another Pizza")
         self.assertNotContains(response, "Test Pizza")
+
+
+class MenuQuerySetTests(TestCase):
+    def setUp(self):
+        self.index_url = reverse("pizza_delivery:index")
+
+    def create_dishes(self, dish_count: int, ingredient_count: int) -> None:
+        ingredients = [
+            Ingredient.objects.create(name=f"Ingredient {number}")
+            for number in range(ingredient_count)
+        ]
+        for number in range(dish_count):
+            dish = Dish.objects.create(
+                name=f"Pizza {number}", price=10 + number, weight=500
+            )
+            for quantity, ingredient in enumerate(ingredients, start=1):
+                DishIngredient.objects.create(
+                    dish=dish, ingredient=ingredient, quantity=quantity
+                )
+
+    def count_index_queries(self) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.index_url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_for_menu_loads_ingredient_summary_in_two_queries(self):
+        self.create_dishes(dish_count=3, ingredient_count=4)
+
+        with self.assertNumQueries(2):
+            summaries = [
+                dish.ingredient_summary for dish in Dish.objects.for_menu()
+            ]
+
+        self.assertEqual(
+            summaries[0],
+            "Ingredient 0, x2 Ingredient 1, x3 Ingredient 2, x4 Ingredient 3",
+        )
+
+    def test_index_query_count_does_not_grow_with_menu(self):
+        # Anonymous visits create no session, a changed menu costs the
+        # snapshot reload: the version row, dishes and their ingredients
+        self.create_dishes(dish_count=1, ingredient_count=1)
+        small_menu_queries = self.count_index_queries()
+
+        self.create_dishes(dish_count=6, ingredient_count=5)
+        large_menu_queries = self.count_index_queries()
+
+        self.assertEqual(small_menu_queries, 3)
+        self.assertEqual(large_menu_queries, 3)
+        # An unchanged menu is served from the snapshot and page cache
+        self.assertEqual(self.count_index_queries(), 0)
+
+    def test_dish_detail_shows_ingredient_summary(self):
+        self.create_dishes(dish_count=1, ingredient_count=2)
+        dish = Dish.objects.get()
+
+        response = self.client.get(dish.get_absolute_url())
+
+        self.assertContains(response, "Ingredient 0, x2 Ingredient 1")
+
+
+class DishSearchTests(TestCase):
+    def setUp(self):
+        self.mozzarella = Ingredient.objects.create(name="Mozzarella")
+        self.margherita = Dish.objects.create(
+            name="Margherita", price=10.0, weight=500
+        )
+        self.four_cheese = Dish.objects.create(
+            name="Four Cheese", price=12.0, weight=500
+        )
+        DishIngredient.objects.create(
+            dish=self.four_cheese, ingredient=self.mozzarella
+        )
+
+    def search(self, query: str) -> list[Dish]:
+        return list(search_dishes(Dish.objects.all(), query))
+
+    def test_search_document_follows_menu_changes(self):
+        self.assertEqual(self.search("rella"), [self.four_cheese])
+
+        DishIngredient.objects.create(
+            dish=self.margherita, ingredient=self.mozzarella
+        )
+        self.assertCountEqual(
+            self.search("rella"), [self.four_cheese, self.margherita]
+        )
+
+        self.mozzarella.name = "Burrata"
+        self.mozzarella.save()
+        self.assertEqual(self.search("rella"), [])
+        self.assertCountEqual(
+            self.search("burrata"), [self.four_cheese, self.margherita]
+        )
+
+        self.mozzarella.delete()
+        self.assertEqual(self.search("burrata"), [])
+
+    def test_search_ranks_by_relevance(self):
+        cheese = Ingredient.objects.create(name="Cheese")
+        DishIngredient.objects.create(dish=self.margherita, ingredient=cheese)
+        cheesy = Dish.objects.create(
+            name="Cheese Cheese Cheese", price=15.0, weight=500
+        )
+
+        results = self.search("cheese")
+
+        self.assertEqual(results[0], cheesy)
+        self.assertCountEqual(
+            results, [cheesy, self.four_cheese, self.margherita]
+        )
+
+    def test_search_short_query_and_quotes(self):
+        self.assertEqual(self.search("Ma"), [self.margherita])
+        self.assertEqual(self.search('"Four" OR'), [])
+
+    def test_deleted_dish_leaves_search(self):
+        self.four_cheese.delete()
+        self.assertEqual(self.search("rella"), [])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        # Repeated prices make sure the pk tie-breaker is respected
+        for number in range(20):
+            Dish.objects.create(
+                name=f"Pizza {number:02}", price=10 + number % 4, weight=500
+            )
+
+    def walk_pages(self, paginator: CursorPaginator) -> list:
+        pages = []
+        page = paginator.page(None)
+        while True:
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            page = paginator.page(page.next_cursor)
+
+    def test_pages_cover_ordering_without_gaps(self):
+        for ordering in [("price", "pk"), ("-price", "-pk"), ("name", "pk")]:
+            paginator = CursorPaginator(Dish.objects.all(), 6, ordering)
+            pages = self.walk_pages(paginator)
+
+            self.assertEqual([page.number for page in pages], [1, 2, 3, 4])
+            self.assertEqual(
+                [dish for page in pages for dish in page],
+                list(Dish.objects.order_by(*ordering)),
+            )
+
+    def test_previous_cursors_point_at_previous_pages(self):
+        paginator = CursorPaginator(Dish.objects.all(), 6, ("price", "pk"))
+        pages = self.walk_pages(paginator)
+
+        last_page = pages[-1]
+        self.assertEqual(
+            [link["number"] for link in last_page.page_links], [2, 3, 4]
+        )
+        previous_page = paginator.page(last_page.previous_cursor)
+        self.assertEqual(previous_page.number, 3)
+        self.assertEqual(list(previous_page), list(pages[2]))
+        self.assertIsNone(pages[1].previous_cursor)
+
+    def test_deep_pages_cost_the_same_queries(self):
+        paginator = CursorPaginator(Dish.objects.all(), 2, ("price", "pk"))
+        second_page = paginator.page(paginator.page(None).next_cursor)
+        deep_page = second_page
+        for _ in range(5):
+            deep_page = paginator.page(deep_page.next_cursor)
+
+        with CaptureQueriesContext(connection) as second_page_queries:
+            paginator.page(second_page.next_cursor)
+        with CaptureQueriesContext(connection) as deep_page_queries:
+            paginator.page(deep_page.next_cursor)
+
+        self.assertEqual(
+            len(second_page_queries.captured_queries),
+            len(deep_page_queries.captured_queries),
+        )
+        for query in deep_page_queries.captured_queries:
+            self.assertNotIn("OFFSET", query["sql"])
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_search_results_page_by_relevance(self):
+        paginator = CursorPaginator(
+            search_dishes(Dish.objects.all(), "Pizza"),
+            6,
+            ("-search_rank", "pk"),
+        )
+        dishes = [dish for page in self.walk_pages(paginator) for dish in page]
+
+        self.assertCountEqual(dishes, Dish.objects.all())
+
+    def test_foreign_or_tampered_cursor_falls_back_to_first_page(self):
+        by_price = CursorPaginator(Dish.objects.all(), 6, ("price", "pk"))
+        by_name = CursorPaginator(Dish.objects.all(), 6, ("name", "pk"))
+        cursor = by_price.page(None).next_cursor
+
+        self.assertEqual(by_name.page(cursor).number, 1)
+        self.assertEqual(by_price.page(cursor + "x").number, 1)
+
+    def test_cursors_are_the_same_every_time_a_page_renders(self):
+        paginator = CursorPaginator(Dish.objects.all(), 6, ("price", "pk"))
+
+        with mock.patch("django.core.signing.time") as clock:
+            clock.time.return_value = 1_000_000_000
+            cursor = paginator.page(None).next_cursor
+            clock.time.return_value += 3600
+            again = paginator.page(None).next_cursor
+
+        self.assertEqual(cursor, again)
+        self.assertEqual(paginator.page(cursor).number, 2)
+
+    def test_approximate_count(self):
+        paginator = CursorPaginator(Dish.objects.all(), 6, ("price", "pk"))
+        self.assertEqual(paginator.approximate_count(), 20)
+
+    def test_index_shows_the_dish_count(self):
+        index_url = reverse("pizza_delivery:index")
+
+        listing = self.client.get(index_url)
+        search = self.client.get(index_url, {"query": "pizza"})
+
+        self.assertEqual(listing.context["page_obj"].count, 20)
+        self.assertEqual(search.context["page_obj"].count, 20)
+        self.assertFalse(search.context["page_obj"].count_estimated)
+        self.assertContains(listing, "20 dishes")
+
+    def test_index_follows_next_cursor(self):
+        index_url = reverse("pizza_delivery:index")
+        first_page = self.client.get(index_url, {"sort": "desc"})
+        cursor = first_page.context["page_obj"].next_cursor
+
+        response = self.client.get(
+            index_url, {"sort": "desc", "cursor": cursor}
+        )
+
+        self.assertEqual(response.context["page_obj"].number, 2)
+        self.assertEqual(
+            [dish.pk for dish in response.context["page_obj"]],
+            list(
+                Dish.objects.order_by("-price", "-pk").values_list(
+                    "pk", flat=True
+                )[6:12]
+            ),
+        )
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+        self.add_remove_dish_url = reverse(
+            "pizza_delivery:add-remove-dish-button"
+        )
+        self.cart_summary_url = reverse("pizza_delivery:cart-summary")
+
+    def test_add_dish_returns_cart_fragment(self):
+        response = self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": self.dish.id},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTemplateUsed(response, "includes/cart_summary.html")
+        self.assertTemplateNotUsed(response, "layouts/base_sections.html")
+        self.assertContains(response, "x1 Test Pizza", status_code=201)
+
+    def test_cart_summary_renders_only_the_fragment(self):
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": self.dish.id},
+        )
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": self.dish.id},
+        )
+
+        response = self.client.get(self.cart_summary_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateNotUsed(response, "layouts/base_sections.html")
+        self.assertContains(response, "x2 Test Pizza")
+        self.assertContains(response, "20.00")
+
+    def test_cart_summary_rejects_post(self):
+        response = self.client.post(self.cart_summary_url)
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchCartOperationsTests(TestCase):
+    def setUp(self):
+        self.margherita = Dish.objects.create(
+            name="Margherita", price=10.0, weight=500
+        )
+        self.pepperoni = Dish.objects.create(
+            name="Pepperoni", price=12.0, weight=500
+        )
+        self.batch_url = reverse("pizza_delivery:batch-cart-operations")
+
+    def post_operations(self, operations: list[dict]):
+        return self.client.post(
+            self.batch_url,
+            json.dumps({"operations": operations}),
+            content_type="application/json",
+        )
+
+    def test_batch_applies_all_operations_in_one_order(self):
+        response = self.post_operations(
+            [
+                {"dish_id": self.margherita.id, "delta": 3},
+                {"dish_id": self.pepperoni.id, "delta": 2},
+                {"dish_id": self.margherita.id, "delta": -1},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "x2 Margherita")
+        self.assertContains(response, "x2 Pepperoni")
+        self.assertEqual(
+            {
+                line["name"]: line["amount"]
+                for line in self.client.session["cart"].values()
+            },
+            {"Margherita": 2, "Pepperoni": 2},
+        )
+
+    def test_batch_removing_everything_empties_the_cart(self):
+        self.post_operations([{"dish_id": self.margherita.id, "delta": 2}])
+        response = self.post_operations(
+            [
+                {"dish_id": self.margherita.id, "delta": -5},
+                {"dish_id": self.pepperoni.id, "delta": -1},
+            ]
+        )
+
+        self.assertNotContains(response, "Margherita")
+        self.assertNotIn("cart", self.client.session)
+
+    def test_batch_with_unknown_dish_changes_nothing(self):
+        response = self.post_operations(
+            [
+                {"dish_id": self.margherita.id, "delta": 1},
+                {"dish_id": 0, "delta": 1},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("cart", self.client.session)
+
+    def test_batch_rejects_malformed_payload(self):
+        response = self.client.post(
+            self.batch_url, "not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post_operations([{"dish_id": "x", "delta": 1}])
+        self.assertEqual(response.status_code, 400)
+
+
+class SessionCartTests(TestCase):
+    def setUp(self):
+        self.margherita = Dish.objects.create(
+            name="Margherita", price=10.0, weight=500
+        )
+        self.pepperoni = Dish.objects.create(
+            name="Pepperoni", price=12.0, weight=500
+        )
+        self.add_remove_dish_url = reverse(
+            "pizza_delivery:add-remove-dish-button"
+        )
+        self.order_complete_url = reverse("pizza_delivery:order-complete")
+
+    def add_one(self, dish: Dish):
+        return self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": dish.id},
+        )
+
+    def test_anonymous_cart_writes_no_orders(self):
+        self.assertEqual(self.add_one(self.margherita).status_code, 201)
+        self.assertEqual(self.add_one(self.margherita).status_code, 200)
+        Dish.objects.filter(pk=self.margherita.pk).update(price=99)
+
+        response = self.client.get(reverse("pizza_delivery:cart-summary"))
+
+        self.assertContains(response, "x2 Margherita")
+        self.assertContains(response, "20.00")
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(DishOrder.objects.count(), 0)
+
+    def test_checkout_materializes_the_order(self):
+        self.add_one(self.margherita)
+        self.add_one(self.pepperoni)
+        self.add_one(self.pepperoni)
+
+        response = self.client.post(
+            self.order_complete_url,
+            {
+                "name": "John Doe",
+                "phone_number": "+12125552368",
+                "address": "123 Streetasd",
+                "asked_date_delivery": (
+                    timezone.now() + timezone.timedelta(hours=3, minutes=40)
+                ).strftime("%Y-%m-%dT%H:%M"),
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get()
+        self.assertEqual(order.status, Order.Status.APPROVED)
+        self.assertEqual(order.name, "John Doe")
+        self.assertEqual(order.total_price, Decimal("34.00"))
+        self.assertEqual(
+            dict(
+                order.order_dishes.values_list("dish__name", "dish_amount")
+            ),
+            {"Margherita": 1, "Pepperoni": 2},
+        )
+        self.assertNotIn("cart", self.client.session)
+
+    def test_login_moves_the_cart_to_the_customer(self):
+        customer = get_user_model().objects.create_user(
+            username="customer", password="12345"
+        )
+        self.add_one(self.margherita)
+
+        self.client.login(username="customer", password="12345")
+
+        self.assertNotIn("cart", self.client.session)
+        order = Order.objects.get(customer=customer)
+        self.assertEqual(order.status, Order.Status.CREATED)
+        self.assertEqual(order.order_dishes.get().dish, self.margherita)
+
+    def test_login_drops_dishes_deleted_from_the_cart(self):
+        customer = get_user_model().objects.create_user(
+            username="customer", password="12345"
+        )
+        self.add_one(self.margherita)
+        self.add_one(self.pepperoni)
+        self.pepperoni.delete()
+
+        logged_in = self.client.login(username="customer", password="12345")
+
+        self.assertTrue(logged_in)
+        self.assertNotIn("cart", self.client.session)
+        order = Order.objects.get(customer=customer)
+        self.assertEqual(order.order_dishes.get().dish, self.margherita)
+        self.assertEqual(order.total_price, Decimal("10.00"))
+
+    def test_change_waits_for_the_cart_lock_and_leaves_it_alone(self):
+        self.add_one(self.margherita)
+        lock_key = f"cart-lock:{self.client.session.session_key}"
+        tiered_cache.shared.add(lock_key, "other request", 60)
+
+        with mock.patch("pizza_delivery.cart.CART_LOCK_TIMEOUT", 0):
+            busy = self.add_one(self.margherita)
+            with self.assertRaises(CartBusy):
+                SessionCart(self.client.session).remove(
+                    {self.margherita.pk: 1}
+                )
+
+        self.assertEqual(busy.status_code, 409)
+        self.assertEqual(tiered_cache.shared.get(lock_key), "other request")
+        tiered_cache.shared.delete(lock_key)
+        self.assertEqual(
+            SessionCart(self.client.session).lines[
+                str(self.margherita.pk)
+            ]["amount"],
+            1,
+        )
+
+
+class LazySessionTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+
+    def test_anonymous_menu_gets_perform_no_writes(self):
+        urls = [
+            reverse("pizza_delivery:index"),
+            reverse("pizza_delivery:index") + "?query=pizza&sort=desc",
+            reverse("pizza_delivery:dish-detail", args=[self.dish.pk]),
+            reverse("pizza_delivery:cart-summary"),
+            reverse("pizza_delivery:order-complete"),
+            reverse("pizza_delivery:clean-order"),
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            for url in urls:
+                self.client.get(url)
+
+        writes = [
+            query["sql"]
+            for query in queries
+            if not query["sql"].lstrip().upper().startswith("SELECT")
+        ]
+        self.assertEqual(writes, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_session_is_created_by_the_first_cart_change(self):
+        add_remove_dish_url = reverse("pizza_delivery:add-remove-dish-button")
+        self.client.post(
+            add_remove_dish_url,
+            {"action": "remove_one", "dish_id": self.dish.id},
+        )
+        self.assertFalse(Session.objects.exists())
+
+        self.client.post(
+            add_remove_dish_url,
+            {"action": "add_one", "dish_id": self.dish.id},
+        )
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        for number in range(1, 4):
+            Dish.objects.create(
+                name=f"Pizza {number}", price=number * 10, weight=500
+            )
+        self.dishes = Dish.objects.in_bulk()
+        self.customer = get_user_model().objects.create_user(
+            username="customer"
+        )
+        self.contact = {
+            "name": "John Doe",
+            "phone_number": "+12125552368",
+            "address": "123 Streetasd",
+            "asked_date_delivery": timezone.now(),
+        }
+
+    def test_customer_cart_is_approved_once(self):
+        cart = DatabaseCart(self.customer)
+        cart.add({dish_id: 1 for dish_id in self.dishes})
+
+        order = cart.checkout(self.contact)
+
+        self.assertEqual(order.status, Order.Status.APPROVED)
+        self.assertEqual(order.name, "John Doe")
+        self.assertEqual(order.total_price, Decimal("60.00"))
+        self.assertIsNone(cart.checkout(self.contact))
+        self.assertEqual(
+            Order.objects.filter(status=Order.Status.APPROVED).count(), 1
+        )
+
+    def test_customer_checkout_query_count_is_constant(self):
+        dish_ids = list(self.dishes)
+        cart = DatabaseCart(self.customer)
+        cart.add({dish_ids[0]: 1})
+        with CaptureQueriesContext(connection) as one_line:
+            cart.checkout(self.contact)
+
+        cart.add({dish_id: 2 for dish_id in dish_ids})
+        with CaptureQueriesContext(connection) as three_lines:
+            cart.checkout(self.contact)
+
+        self.assertEqual(len(one_line), len(three_lines))
+
+    def test_double_submitted_session_cart_is_ordered_once(self):
+        first_request = SessionStore()
+        SessionCart(first_request).add(
+            {dish_id: 2 for dish_id in self.dishes}, self.dishes
+        )
+        # A second request read the same session before the first one
+        # cleared the cart
+        second_request = SessionStore()
+        second_request.update(dict(first_request.items()))
+
+        order = SessionCart(first_request).checkout(self.contact)
+
+        self.assertIsNone(SessionCart(second_request).checkout(self.contact))
+        self.assertEqual(Order.objects.get(), order)
+        self.assertEqual(order.total_price, Decimal("120.00"))
+        self.assertEqual(order.order_dishes.count(), 3)
+
+    def test_order_approved_is_sent_after_commit(self):
+        approved = []
+
+        def receiver(sender, order, **kwargs):
+            approved.append(order.pk)
+
+        order_approved.connect(receiver)
+        self.addCleanup(order_approved.disconnect, receiver)
+        cart = DatabaseCart(self.customer)
+        cart.add({next(iter(self.dishes)): 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = cart.checkout(self.contact)
+            self.assertEqual(approved, [])
+
+        self.assertEqual(approved, [order.pk])
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        for number in range(20):
+            Dish.objects.create(
+                name=f"Pizza {number}", price=number % 7 + 1, weight=500
+            )
+        self.dish_ids = list(Dish.objects.values_list("pk", flat=True))
+        self.customer = get_user_model().objects.create_user(
+            username="customer"
+        )
+        if connection.vendor == "postgresql":
+            # Tiny test tables are cheaper to scan, only fall back to a
+            # scan when no index fits
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def full_scans(self, sql: str) -> list[str]:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes, scans = [plan[0]["Plan"]], []
+                while nodes:
+                    node = nodes.pop()
+                    if node["Node Type"] == "Seq Scan":
+                        scans.append(node["Relation Name"])
+                    nodes.extend(node.get("Plans", []))
+                return scans
+
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [
+                detail
+                for *_, detail in cursor.fetchall()
+                # A subquery scan reads the bounded derived table of a
+                # LIMITed count, not a table
+                if re.fullmatch(r"SCAN \w+", detail)
+                and detail != "SCAN subquery"
+            ]
+
+    def assertNoFullScans(self, queries: CaptureQueriesContext) -> None:
+        statements = [
+            query["sql"]
+            for query in queries
+            if query["sql"].split(" ", 1)[0].upper()
+            in ("SELECT", "INSERT", "UPDATE", "DELETE")
+        ]
+        self.assertTrue(statements)
+        for sql in statements:
+            self.assertEqual(self.full_scans(sql), [], sql)
+
+    def test_customer_cart_queries_use_indexes(self):
+        cart = DatabaseCart(self.customer)
+
+        with CaptureQueriesContext(connection) as queries:
+            cart.add({dish_id: 2 for dish_id in self.dish_ids[:3]})
+            cart.remove({self.dish_ids[0]: 1, self.dish_ids[1]: 2})
+            cart.summary()
+            cart.checkout({"name": "John Doe"})
+
+        self.assertNoFullScans(queries)
+
+    def test_menu_pages_use_indexes(self):
+        index_url = reverse("pizza_delivery:index")
+        first_page = self.client.get(index_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            # Plain listings come from the menu snapshot, searches still
+            # page through the database
+            for sort in ("asc", "desc", "name"):
+                response = self.client.get(
+                    index_url, {"query": "pizza", "sort": sort}
+                )
+                self.client.get(
+                    index_url,
+                    {
+                        "query": "pizza",
+                        "sort": sort,
+                        "cursor": response.context["page_obj"].next_cursor,
+                    },
+                )
+            self.client.get(
+                reverse(
+                    "pizza_delivery:dish-detail", args=[self.dish_ids[0]]
+                )
+            )
+
+        self.assertEqual(first_page.status_code, 200)
+        self.assertNoFullScans(queries)
+
+    def test_reaper_lookups_use_indexes(self):
+        DatabaseCart(self.customer).add({self.dish_ids[0]: 1})
+        Order.objects.update(
+            updated_at=timezone.now() - timezone.timedelta(days=30)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("reap_stale_carts", stdout=StringIO())
+
+        self.assertFalse(Order.objects.exists())
+        self.assertNoFullScans(queries)
+
+
+class ReapStaleCartsTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+        self.long_ago = timezone.now() - timezone.timedelta(days=30)
+        self.carts = []
+        for number in range(3):
+            customer = get_user_model().objects.create_user(
+                username=f"customer{number}"
+            )
+            cart = DatabaseCart(customer)
+            cart.add({self.dish.pk: 1})
+            self.carts.append(cart)
+        Order.objects.update(updated_at=self.long_ago)
+
+    def reap(self, *args) -> str:
+        stdout = StringIO()
+        call_command("reap_stale_carts", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_only_stale_open_carts_are_deleted(self):
+        # Touched today and already ordered carts both stay
+        self.carts[0].add({self.dish.pk: 1})
+        self.carts[1].checkout({"name": "John Doe"})
+        Order.objects.update(updated_at=self.long_ago)
+        self.carts[0].add({self.dish.pk: 1})
+
+        output = self.reap("--days", "7", "--batch-size", "1")
+
+        self.assertIn("Deleted 1 carts and 1 cart lines", output)
+        self.assertEqual(
+            set(Order.objects.values_list("customer", flat=True)),
+            {self.carts[0].customer.pk, self.carts[1].customer.pk},
+        )
+        self.assertEqual(DishOrder.objects.count(), 2)
+
+    def test_batches_delete_every_stale_cart(self):
+        output = self.reap("--batch-size", "2")
+
+        self.assertIn("Deleted 3 carts and 3 cart lines", output)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(DishOrder.objects.exists())
+
+    def test_dry_run_deletes_nothing(self):
+        expired = SessionStore()
+        expired.set_expiry(-1)
+        expired.save()
+
+        output = self.reap("--dry-run")
+
+        self.assertIn("Would delete 3 carts", output)
+        self.assertIn("Would delete 1 sessions", output)
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertTrue(Session.objects.exists())
+
+    def test_expired_sessions_are_deleted(self):
+        live = SessionStore()
+        live.create()
+        expired = SessionStore()
+        expired.set_expiry(-1)
+        expired.save()
+
+        output = self.reap()
+
+        self.assertIn("Deleted 1 sessions", output)
+        self.assertEqual(
+            list(Session.objects.values_list("session_key", flat=True)),
+            [live.session_key],
+        )
+
+    def test_report_counts_only_the_reaped_rows(self):
+        # Rows a cascade deletes along with the carts aren't carts
+        cascaded = {
+            Order._meta.label: 1,
+            DishOrder._meta.label: 2,
+            OrderStatusChange._meta.label: 1,
+        }
+        with mock.patch(
+            "django.db.models.QuerySet.delete", return_value=(4, cascaded)
+        ):
+            output = self.reap("--batch-size", "4")
+
+        self.assertIn("Deleted 1 carts and 2 cart lines", output)
+
+
+class CartUpsertTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create_user(username="customer")
+        )
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+        self.add_remove_dish_url = reverse(
+            "pizza_delivery:add-remove-dish-button"
+        )
+
+    def click(self, action: str):
+        return self.client.post(
+            self.add_remove_dish_url,
+            {"action": action, "dish_id": self.dish.id},
+        )
+
+    def test_repeated_adds_keep_one_order_and_line(self):
+        self.assertEqual(self.click("add_one").status_code, 201)
+        self.assertEqual(self.click("add_one").status_code, 200)
+        self.assertEqual(self.click("remove_one").status_code, 200)
+        self.assertEqual(self.click("add_one").status_code, 200)
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(
+            list(DishOrder.objects.values_list("dish_amount", flat=True)),
+            [2],
+        )
+
+    def test_cart_writes_are_constant_queries(self):
+        self.click("add_one")
+        for number in range(10):
+            dish = Dish.objects.create(
+                name=f"Pizza {number}", price=10.0, weight=500
+            )
+            self.client.post(
+                self.add_remove_dish_url,
+                {"action": "add_one", "dish_id": dish.id},
+            )
+        order = Order.objects.get()
+        dish_ids = list(Dish.objects.values_list("pk", flat=True))
+
+        with self.assertNumQueries(2):
+            add_to_cart(order, {dish_id: 2 for dish_id in dish_ids})
+        with self.assertNumQueries(4):
+            remove_from_cart(order, {dish_id: 1 for dish_id in dish_ids})
+
+        self.assertEqual(
+            set(DishOrder.objects.values_list("dish_amount", flat=True)),
+            {2},
+        )
+
+
+# SQLite test databases can't serve parallel writers, run on PostgreSQL
+@skipUnlessDBFeature("test_db_allows_multiple_connections")
+class ConcurrentCartTests(TransactionTestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+        self.add_remove_dish_url = reverse(
+            "pizza_delivery:add-remove-dish-button"
+        )
+        self.client.force_login(
+            get_user_model().objects.create_user(username="customer")
+        )
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": self.dish.id},
+        )
+
+    def add_one_in_thread(self, _) -> int:
+        client = Client()
+        client.cookies = self.client.cookies
+        try:
+            return client.post(
+                self.add_remove_dish_url,
+                {"action": "add_one", "dish_id": self.dish.id},
+            ).status_code
+        finally:
+            connections.close_all()
+
+    def test_parallel_adds_lose_no_updates(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(self.add_one_in_thread, range(16)))
+
+        self.assertEqual(statuses, [200] * 16)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(DishOrder.objects.get().dish_amount, 17)
+
+    def test_parallel_anonymous_adds_lose_no_updates(self):
+        self.client.logout()
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": self.dish.id},
+        )
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(self.add_one_in_thread, range(16)))
+
+        self.assertEqual(statuses, [200] * 16)
+        self.assertEqual(
+            SessionCart(self.client.session).summary()["order_items"],
+            [
+                {
+                    "dish_name": "Test Pizza",
+                    "dish_amount": 17,
+                    "dish_price": Decimal("170.00"),
+                }
+            ],
+        )
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create()
+        for number in range(1, 4):
+            dish = Dish.objects.create(
+                name=f"Pizza {number}", price=number * 10, weight=500
+            )
+            DishOrder.objects.create(
+                order=self.order, dish=dish, dish_amount=number
+            )
+        Order.objects.filter(pk=self.order.pk).refresh_totals()
+        self.order.refresh_from_db()
+        self.add_remove_dish_url = reverse(
+            "pizza_delivery:add-remove-dish-button"
+        )
+        self.cart_summary_url = reverse("pizza_delivery:cart-summary")
+
+    def test_item_counts_annotate_orders_in_one_query(self):
+        Order.objects.create(status=Order.Status.APPROVED)
+
+        with self.assertNumQueries(1):
+            totals = {
+                order.pk: (order.total_price, order.item_count)
+                for order in Order.objects.with_item_counts()
+            }
+
+        self.assertEqual(totals[self.order.pk], (Decimal("140.00"), 6))
+        self.assertIn((Decimal("0.00"), 0), totals.values())
+
+    def test_order_price_reads_the_stored_total(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.order.order_price, Decimal("140.00"))
+
+    def test_lines_keep_the_price_they_were_added_at(self):
+        customer = get_user_model().objects.create_user(username="customer")
+        self.client.force_login(customer)
+        dish = Dish.objects.get(name="Pizza 1")
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": dish.id},
+        )
+        Dish.objects.filter(pk=dish.pk).update(price=99)
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": dish.id},
+        )
+
+        cart = Order.objects.get(customer=customer)
+        self.assertEqual(cart.total_price, Decimal("20.00"))
+        self.assertEqual(
+            cart.order_dishes.get().unit_price, Decimal("10.00")
+        )
+
+    def test_cart_summary_query_count_is_constant(self):
+        dish_ids = list(Dish.objects.values_list("pk", flat=True))
+        self.client.post(
+            self.add_remove_dish_url,
+            {"action": "add_one", "dish_id": dish_ids[0]},
+        )
+        with CaptureQueriesContext(connection) as one_line:
+            self.client.get(self.cart_summary_url)
+
+        for dish_id in dish_ids[1:]:
+            self.client.post(
+                self.add_remove_dish_url,
+                {"action": "add_one", "dish_id": dish_id},
+            )
+        with CaptureQueriesContext(connection) as three_lines:
+            response = self.client.get(self.cart_summary_url)
+
+        self.assertContains(response, "60.00")
+        self.assertEqual(
+            len(one_line.captured_queries), len(three_lines.captured_queries)
+        )
+
+    def test_admin_changelist_shows_totals(self):
+        admin_user = get_user_model().objects.create_superuser(
+            username="admin", password="12345", email="admin@example.com"
+        )
+        self.client.force_login(admin_user)
+
+        response = self.client.get(
+            reverse("admin:pizza_delivery_order_changelist")
+        )
+
+        self.assertContains(response, "140.00")
+
+
+class ArchiveOrdersTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+        self.orders = {}
+        for status in Order.Status:
+            order = Order.objects.create(status=status, name=status.label)
+            DishOrder.objects.create(
+                order=order, dish=self.dish, dish_amount=2
+            )
+            self.orders[status] = order
+        Order.objects.refresh_totals()
+        Order.objects.update(
+            updated_at=timezone.now() - timezone.timedelta(days=100)
+        )
+        self.recent = Order.objects.create(status=Order.Status.DELIVERED)
+
+    def archive(self, *args) -> str:
+        stdout = StringIO()
+        call_command("archive_orders", "--days", "90", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_old_finished_orders_move_with_their_lines(self):
+        output = self.archive("--batch-size", "1")
+
+        self.assertIn("Archived 2 orders and 2 lines", output)
+        moved = {self.orders["delivered"].pk, self.orders["canceled"].pk}
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list("pk", flat=True)), moved
+        )
+        self.assertFalse(Order.objects.filter(pk__in=moved).exists())
+        self.assertFalse(DishOrder.objects.filter(order__in=moved).exists())
+        self.assertTrue(Order.objects.filter(pk=self.recent.pk).exists())
+
+        archived = ArchivedOrder.objects.get(pk=self.orders["delivered"].pk)
+        self.assertEqual(archived.order_price, Decimal("20.00"))
+        self.assertEqual(
+            str(archived.order_dishes.get()), "x2 Test Pizza"
+        )
+
+    def test_rerun_after_an_interrupted_copy_finishes_the_move(self):
+        delivered = self.orders["delivered"]
+        ArchivedOrder.objects.create(
+            id=delivered.pk,
+            status=delivered.status,
+            created_at=delivered.created_at,
+            updated_at=delivered.updated_at,
+            total_price=Decimal("20.00"),
+        )
+
+        self.archive()
+
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.assertEqual(ArchivedDishOrder.objects.count(), 2)
+        self.assertFalse(Order.objects.filter(pk=delivered.pk).exists())
+
+    def test_dry_run_moves_nothing(self):
+        self.assertIn("Would archive 2 orders", self.archive("--dry-run"))
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+    def test_order_history_reads_both_tables(self):
+        self.archive()
+
+        history = order_history("id", "status", status__in=["canceled"])
+
+        self.assertEqual(
+            list(history),
+            [{"id": self.orders["canceled"].pk, "status": "canceled"}],
+        )
+        self.assertEqual(order_history().count(), Order.objects.count() + 2)
+
+    def test_archive_admin_is_read_only(self):
+        self.archive()
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                username="admin", password="12345", email="admin@example.com"
+            )
+        )
+        archived = ArchivedOrder.objects.first()
+
+        changelist = self.client.get(
+            reverse("admin:pizza_delivery_archivedorder_changelist")
+        )
+        change = self.client.post(
+            reverse(
+                "admin:pizza_delivery_archivedorder_change",
+                args=[archived.pk],
+            ),
+            {"status": "approved"},
+        )
+
+        self.assertContains(changelist, str(archived.pk))
+        self.assertEqual(change.status_code, 403)
+        archived.refresh_from_db()
+        self.assertNotEqual(archived.status, "approved")
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                username="admin", password="12345", email="admin@example.com"
+            )
+        )
+        self.dish = Dish.objects.create(
+            name="Test Pizza", price=10.0, weight=500
+        )
+        self.changelist_url = reverse("admin:pizza_delivery_order_changelist")
+        self.orders = [
+            self.create_order(phone_number, email)
+            for phone_number, email in [
+                ("+380501234567", "john@example.com"),
+                ("+380671234567", "jane@example.com"),
+                ("+12125552368", "bob@example.org"),
+            ]
+        ]
+
+    def create_order(self, phone_number="", email="") -> Order:
+        order = Order.objects.create(
+            status=Order.Status.APPROVED,
+            phone_number=phone_number,
+            email=email,
+        )
+        DishOrder.objects.create(order=order, dish=self.dish, dish_amount=3)
+        Order.objects.filter(pk=order.pk).refresh_totals()
+        return order
+
+    def search(self, term: str) -> set[int]:
+        response = self.client.get(self.changelist_url, {"q": term})
+        return {order.pk for order in response.context["cl"].result_list}
+
+    def test_search_targets_id_phone_and_email(self):
+        john, jane, bob = self.orders
+
+        self.assertEqual(self.search(str(bob.pk)), {bob.pk})
+        self.assertEqual(self.search("+38 (050) 123"), {john.pk})
+        self.assertEqual(self.search("+380"), {john.pk, jane.pk})
+        self.assertEqual(self.search("38067123"), {jane.pk})
+        self.assertEqual(self.search("Jane@"), {jane.pk})
+        self.assertEqual(self.search("example.com"), set())
+        self.assertEqual(self.search("²"), set())
+        self.assertEqual(self.search("١٢"), set())
+
+    def test_search_ignores_the_case_emails_were_typed_in(self):
+        order = self.create_order(email="Alice.Smith@Example.com")
+
+        self.assertEqual(self.search("alice.smith@"), {order.pk})
+        self.assertEqual(self.search("ALICE"), {order.pk})
+
+    def test_changelist_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few_orders:
+            response = self.client.get(self.changelist_url)
+        for _ in range(20):
+            self.create_order()
+        with CaptureQueriesContext(connection) as more_orders:
+            self.client.get(self.changelist_url)
+
+        self.assertContains(response, "30.00")
+        self.assertEqual(len(few_orders), len(more_orders))
+        counts = [
+            query["sql"]
+            for query in more_orders
+            if "COUNT(" in query["sql"].upper()
+        ]
+        self.assertTrue(counts)
+        for sql in counts:
+            self.assertIn("LIMIT", sql.upper())
+
+    def test_date_hierarchy_links_days_with_orders(self):
+        created_at = timezone.localtime(self.orders[0].created_at)
+
+        response = self.client.get(self.changelist_url)
+
+        self.assertContains(
+            response,
+            f"?created_at__day={created_at.day}"
+            f"&amp;created_at__month={created_at.month}"
+            f"&amp;created_at__year={created_at.year}",
+        )
+        self.assertNotContains(
+            response, f"created_at__day={created_at.day % 28 + 1}&amp;"
+        )
+
+    def test_date_hierarchy_probes_years_without_aggregating(self):
+        created_at = timezone.localtime(self.orders[0].created_at)
+        Order.objects.filter(pk=self.orders[0].pk).update(
+            created_at=created_at.replace(year=created_at.year - 2)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url)
+
+        self.assertContains(response, f"?created_at__year={created_at.year}")
+        self.assertContains(
+            response, f"?created_at__year={created_at.year - 2}"
+        )
+        self.assertNotContains(
+            response, f"?created_at__year={created_at.year - 1}"
+        )
+        for query in queries:
+            self.assertNotIn("MIN(", query["sql"].upper())
+            self.assertNotIn("MAX(", query["sql"].upper())
+
+    def test_date_hierarchy_filters_by_year(self):
+        year = timezone.localtime(self.orders[0].created_at).year
+
+        response = self.client.get(
+            self.changelist_url, {"created_at__year": year}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), 3)
+
+
+class DishOrderAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                username="admin", password="12345", email="admin@example.com"
+            )
+        )
+        self.dishes = [
+            Dish.objects.create(name=name, price=10, weight=500)
+            for name in ("Margherita", "Pepperoni", "Hawaiian")
+        ]
+        self.changelist_url = reverse(
+            "admin:pizza_delivery_dishorder_changelist"
+        )
+
+    def create_order(self) -> Order:
+        order = Order.objects.create(status=Order.Status.APPROVED)
+        DishOrder.objects.bulk_create(
+            DishOrder(order=order, dish=dish, dish_amount=1, unit_price=10)
+            for dish in self.dishes
+        )
+        return order
+
+    def test_changelist_query_count_is_constant(self):
+        self.create_order()
+        with CaptureQueriesContext(connection) as few_lines:
+            response = self.client.get(self.changelist_url)
+        for _ in range(10):
+            self.create_order()
+        with CaptureQueriesContext(connection) as more_lines:
+            self.client.get(self.changelist_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few_lines), len(more_lines))
+        self.assertNotContains(response, "order__id__exact")
+
+    def test_search_and_filters(self):
+        first, second = self.create_order(), self.create_order()
+        Order.objects.filter(pk=second.pk).update(
+            status=Order.Status.DELIVERED
+        )
+
+        by_order = self.client.get(self.changelist_url, {"q": first.pk})
+        by_dish = self.client.get(self.changelist_url, {"q": "pepp"})
+        by_status = self.client.get(
+            self.changelist_url, {"order__status__exact": "delivered"}
+        )
+
+        self.assertEqual(
+            {line.order_id for line in by_order.context["cl"].result_list},
+            {first.pk},
+        )
+        self.assertEqual(len(by_dish.context["cl"].result_list), 2)
+        self.assertEqual(
+            {line.order_id for line in by_status.context["cl"].result_list},
+            {second.pk},
+        )
+
+    def test_order_inline_edits_lines_and_refreshes_the_total(self):
+        order = self.create_order()
+        lines = list(order.order_dishes.order_by("pk"))
+        data = {
+            "status": "approved",
+            "order_dishes-TOTAL_FORMS": "3",
+            "order_dishes-INITIAL_FORMS": "3",
+        }
+        for index, line in enumerate(lines):
+            data[f"order_dishes-{index}-id"] = line.pk
+            data[f"order_dishes-{index}-order"] = order.pk
+            data[f"order_dishes-{index}-dish"] = line.dish_id
+            data[f"order_dishes-{index}-dish_amount"] = 2
+            data[f"order_dishes-{index}-unit_price"] = "10.00"
+        data["order_dishes-2-DELETE"] = "on"
+
+        response = self.client.post(
+            reverse("admin:pizza_delivery_order_change", args=[order.pk]),
+            data,
+        )
+
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertEqual(order.order_dishes.count(), 2)
+        self.assertEqual(order.total_price, Decimal("40.00"))
+
+
+class OrderStatusTransitionTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", password="12345", email="admin@example.com"
+        )
+        self.approved = [
+            Order.objects.create(status=Order.Status.APPROVED)
+            for _ in range(3)
+        ]
+        self.cart = Order.objects.create(status=Order.Status.CREATED)
+
+    def test_transition_moves_valid_orders_and_records_history(self):
+        moved = Order.objects.all().transition(
+            Order.Status.DELIVERED, changed_by=self.admin
+        )
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(
+            Order.objects.filter(status=Order.Status.DELIVERED).count(), 3
+        )
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.status, Order.Status.CREATED)
+        self.assertEqual(
+            set(
+                OrderStatusChange.objects.values_list(
+                    "order_id", "from_status", "to_status", "changed_by"
+                )
+            ),
+            {
+                (order.pk, "approved", "delivered", self.admin.pk)
+                for order in self.approved
+            },
+        )
+
+    def test_transition_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few_orders:
+            Order.objects.filter(pk=self.approved[0].pk).transition(
+                Order.Status.CANCELED
+            )
+        with CaptureQueriesContext(connection) as more_orders:
+            Order.objects.all().transition(Order.Status.CANCELED)
+
+        self.assertEqual(len(few_orders), len(more_orders))
+        self.assertEqual(Order.objects.all().transition("canceled"), 0)
+        with self.assertRaises(ValueError):
+            Order.objects.all().transition(Order.Status.APPROVED)
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse("admin:pizza_delivery_order_changelist"),
+            {
+                "action": "mark_delivered",
+                "_selected_action": [self.approved[0].pk, self.cart.pk],
+            },
+            follow=True,
+        )
+
+        self.assertContains(response, "1 orders moved to delivered.")
+        self.assertContains(response, "1 orders can&#x27;t be moved")
+        self.assertEqual(
+            list(
+                Order.objects.filter(
+                    status=Order.Status.DELIVERED
+                ).values_list("pk", flat=True)
+            ),
+            [self.approved[0].pk],
+        )
+        self.assertTrue(
+            OrderStatusChange.objects.filter(
+                order=self.approved[0], changed_by=self.admin
+            ).exists()
+        )
+
+    def test_admin_change_records_history(self):
+        self.client.force_login(self.admin)
+        order = self.approved[0]
+        self.client.post(
+            reverse("admin:pizza_delivery_order_change", args=[order.pk]),
+            {
+                "status": "canceled",
+                "order_dishes-TOTAL_FORMS": "0",
+                "order_dishes-INITIAL_FORMS": "0",
+            },
+        )
+
+        change = OrderStatusChange.objects.get(order=order)
+        self.assertEqual(
+            (change.from_status, change.to_status, change.changed_by),
+            ("approved", "canceled", self.admin),
+        )
+
+    def test_admin_rejects_moves_outside_the_transitions(self):
+        self.client.force_login(self.admin)
+        order = self.approved[0]
+        order.customer = self.admin
+        order.save()
+        Order.objects.create(customer=self.admin)
+
+        response = self.client.post(
+            reverse("admin:pizza_delivery_order_change", args=[order.pk]),
+            {
+                "status": "created",
+                "customer": self.admin.pk,
+                "order_dishes-TOTAL_FORMS": "0",
+                "order_dishes-INITIAL_FORMS": "0",
+            },
+        )
+        changelist = self.client.get(
+            reverse("admin:pizza_delivery_order_changelist")
+        )
+
+        self.assertContains(response, "can&#x27;t be moved from approved")
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.APPROVED)
+        self.assertFalse(OrderStatusChange.objects.exists())
+        self.assertNotContains(changelist, 'name="form-0-status"')
+
+    def test_command(self):
+        Order.objects.filter(pk=self.approved[0].pk).update(
+            created_at=timezone.now() - timezone.timedelta(days=1)
+        )
+        before = (timezone.now() - timezone.timedelta(hours=1)).isoformat()
+        dry_run, out = StringIO(), StringIO()
+
+        call_command(
+            "transition_orders",
+            "delivered",
+            "--created-before",
+            before,
+            "--dry-run",
+            stdout=dry_run,
+        )
+        call_command(
+            "transition_orders",
+            "delivered",
+            "--created-before",
+            before,
+            "--user",
+            "admin",
+            stdout=out,
+        )
+
+        self.assertIn("Would move 1 orders to delivered", dry_run.getvalue())
+        self.assertIn("Moved 1 orders to delivered", out.getvalue())
+        self.assertEqual(
+            OrderStatusChange.objects.get().changed_by, self.admin
+        )
+
+
+class MenuImportExportTests(TestCase):
+    def menu_lines(self, count: int, prefix: str = "Pizza") -> str:
+        return "".join(
+            json.dumps(
+                {
+                    "name": f"{prefix} {number}",
+                    "price": "10.00",
+                    "weight": 500,
+                    "ingredients": [
+                        {"name": "Mozzarella", "quantity": 2},
+                        {"name": f"Topping {number}"},
+                    ],
+                }
+            )
+            + "\n"
+            for number in range(count)
+        )
+
+    def import_lines(self, lines: str, batch_size: int = 1000) -> list:
+        return list(import_menu(read_jsonl(StringIO(lines)), batch_size))
+
+    def test_import_creates_then_updates_by_name(self):
+        self.assertEqual(
+            self.import_lines(self.menu_lines(5), batch_size=2),
+            [(2, 0), (2, 0), (1, 0)],
+        )
+        self.assertEqual(Ingredient.objects.count(), 6)
+        dish = Dish.objects.get(name="Pizza 1")
+        self.assertEqual(dish.ingredient_summary, "x2 Mozzarella, Topping 1")
+
+        updated = json.dumps(
+            {
+                "name": "Pizza 1",
+                "price": "12.50",
+                "weight": 550,
+                "ingredients": [{"name": "Basil", "quantity": 3}],
+            }
+        )
+        self.assertEqual(self.import_lines(updated + "\n"), [(0, 1)])
+        dish.refresh_from_db()
+        self.assertEqual(
+            (dish.price, dish.weight, dish.ingredient_summary),
+            (Decimal("12.50"), 550, "x3 Basil"),
+        )
+        self.assertEqual(Dish.objects.count(), 5)
+        self.assertEqual(
+            list(search_dishes(Dish.objects.all(), "Basil")), [dish]
+        )
+
+    def test_import_query_count_is_constant_per_batch(self):
+        with CaptureQueriesContext(connection) as few_dishes:
+            self.import_lines(self.menu_lines(3))
+        with CaptureQueriesContext(connection) as more_dishes:
+            self.import_lines(self.menu_lines(30, prefix="Calzone"))
+
+        self.assertEqual(len(few_dishes), len(more_dishes))
+
+    def test_reimported_recipes_replace_lines_in_constant_queries(self):
+        def rewrite(count: int, prefix: str) -> list:
+            self.import_lines(self.menu_lines(count, prefix=prefix))
+            records = [
+                json.loads(line)
+                for line in self.menu_lines(count, prefix=prefix).splitlines()
+            ]
+            for record in records:
+                record["ingredients"] = [{"name": "Basil"}]
+            version = catalog.current_version(catalog.MENU_VERSION)
+            with CaptureQueriesContext(connection) as queries:
+                self.import_lines(
+                    "".join(json.dumps(record) + "\n" for record in records)
+                )
+            self.assertEqual(
+                catalog.current_version(catalog.MENU_VERSION), version + 1
+            )
+            return queries
+
+        Ingredient.objects.create(name="Basil")
+        few_lines = rewrite(2, "Pizza")
+        more_lines = rewrite(20, "Calzone")
+
+        self.assertEqual(len(few_lines), len(more_lines))
+        self.assertEqual(
+            Dish.objects.get(name="Calzone 3").ingredient_summary, "Basil"
+        )
+        self.assertEqual(
+            list(search_dishes(Dish.objects.all(), "Topping 3")), []
+        )
+
+    def test_import_rejects_quantities_below_one(self):
+        line = json.dumps(
+            {
+                "name": "Pizza",
+                "price": "10.00",
+                "weight": 500,
+                "ingredients": [{"name": "Basil", "quantity": 0}],
+            }
+        )
+
+        with self.assertRaisesMessage(MenuImportError, "Record 1"):
+            self.import_lines(line + "\n")
+        self.assertFalse(Dish.objects.exists())
+
+    def test_csv_and_jsonl_round_trip(self):
+        self.import_lines(self.menu_lines(3))
+        exported = list(export_menu())
+
+        for write, read in [(write_csv, read_csv), (write_jsonl, read_jsonl)]:
+            stream = StringIO()
+            self.assertEqual(write(export_menu(batch_size=2), stream), 3)
+            stream.seek(0)
+            self.assertEqual(list(import_menu(read(stream))), [(0, 0)])
+            self.assertEqual(list(export_menu()), exported)
+
+    def test_commands(self):
+        self.import_lines(self.menu_lines(2))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "menu.csv")
+            call_command(
+                "export_menu",
+                "--format",
+                "csv",
+                "--output",
+                path,
+                stderr=StringIO(),
+            )
+            Dish.objects.all().delete()
+            out = StringIO()
+            call_command("import_menu", path, stdout=out)
+
+            with open(path, "a", encoding="utf-8") as stream:
+                stream.write("Broken,,not a price,500,,\n")
+            with self.assertRaisesMessage(CommandError, "Record 3"):
+                call_command("import_menu", path, stdout=StringIO())
+
+        self.assertIn("Created 2 and updated 0 dishes", out.getvalue())
+        self.assertEqual(
+            Dish.objects.get(name="Pizza 0").ingredient_summary,
+            "x2 Mozzarella, Topping 0",
+        )
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.url = reverse("pizza_delivery:order-export")
+        self.client.force_login(
+            get_user_model().objects.create_user(
+                username="finance", password="12345", is_staff=True
+            )
+        )
+        self.dish = Dish.objects.create(
+            name="Margherita", price=10, weight=500
+        )
+        self.delivered = self.create_order(Order.Status.DELIVERED, days=3)
+        self.canceled = self.create_order(Order.Status.CANCELED, days=1)
+        self.cart = self.create_order(Order.Status.CREATED, days=1)
+        self.archived = ArchivedOrder.objects.create(
+            id=self.delivered.pk + 100,
+            status=Order.Status.DELIVERED,
+            created_at=timezone.now() - timezone.timedelta(days=120),
+            updated_at=timezone.now(),
+            total_price=Decimal("30.00"),
+        )
+        ArchivedDishOrder.objects.create(
+            id=1,
+            order=self.archived,
+            dish_name="Quattro Formaggi",
+            dish_amount=2,
+            unit_price=Decimal("15.00"),
+        )
+
+    def create_order(self, status: str, days: int) -> Order:
+        order = Order.objects.create(status=status, email="jane@example.com")
+        DishOrder.objects.create(
+            order=order, dish=self.dish, dish_amount=3, unit_price=9
+        )
+        Order.objects.filter(pk=order.pk).refresh_totals()
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - timezone.timedelta(days=days)
+        )
+        return order
+
+    def export(self, **params) -> list:
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        if params.get("format") == "ndjson":
+            return [json.loads(line) for line in content.splitlines()]
+        return content.splitlines()
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(
+            get_user_model().objects.create_user(username="customer")
+        )
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_ndjson_includes_archived_orders_and_lines(self):
+        records = self.export(format="ndjson")
+
+        self.assertEqual(
+            [record["order_id"] for record in records],
+            [self.archived.pk, self.delivered.pk, self.canceled.pk],
+        )
+        self.assertEqual(
+            records[0]["lines"][0]["dish_name"], "Quattro Formaggi"
+        )
+        self.assertEqual(
+            (records[1]["total_price"], records[1]["lines"]),
+            (
+                "27.00",
+                [
+                    {
+                        "dish_id": self.dish.pk,
+                        "dish_name": "Margherita",
+                        "dish_amount": 3,
+                        "unit_price": "9.00",
+                        "line_price": "27.00",
+                    }
+                ],
+            ),
+        )
+
+    def test_csv_with_filters(self):
+        two_days_ago = timezone.localdate() - timezone.timedelta(days=2)
+        rows = self.export(
+            format="csv", status="canceled", date_from=two_days_ago
+        )
+
+        self.assertEqual(rows[0].split(",")[:2], ["order_id", "status"])
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].startswith(f"{self.canceled.pk},canceled,"))
+        self.assertTrue(rows[1].endswith(",Margherita,3,9.00,27.00"))
+        self.assertEqual(len(self.export(date_to=two_days_ago)), 3)
+
+    def test_invalid_filters(self):
+        response = self.client.get(
+            self.url, {"date_from": "2026-02-01", "date_to": "2026-01-01"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url, {"status": "created"}).status_code, 400
+        )
+
+    def test_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as few_orders:
+            self.export(format="csv")
+        for _ in range(10):
+            self.create_order(Order.Status.APPROVED, days=0)
+        with CaptureQueriesContext(connection) as more_orders:
+            rows = self.export(format="csv")
+
+        self.assertEqual(len(rows), 14)
+        self.assertEqual(len(few_orders), len(more_orders))
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.margherita = Dish.objects.create(
+            name="Margherita", price=10, weight=500
+        )
+        self.pepperoni = Dish.objects.create(
+            name="Pepperoni", price=12, weight=500
+        )
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timezone.timedelta(days=1)
+        self.first = self.create_order(Order.Status.DELIVERED, days=1)
+        self.second = self.create_order(Order.Status.APPROVED, days=0)
+        self.create_order(Order.Status.CREATED, days=0)
+
+    def create_order(self, status: str, days: int) -> Order:
+        order = Order.objects.create(status=status)
+        DishOrder.objects.bulk_create(
+            [
+                DishOrder(
+                    order=order,
+                    dish=self.margherita,
+                    dish_amount=2,
+                    unit_price=10,
+                ),
+                DishOrder(
+                    order=order,
+                    dish=self.pepperoni,
+                    dish_amount=1,
+                    unit_price=12,
+                ),
+            ]
+        )
+        Order.objects.filter(pk=order.pk).refresh_totals()
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - timezone.timedelta(days=days)
+        )
+        return order
+
+    def roll_up(self) -> list:
+        # The watermark ends up at the current time
+        return rollup_sales(now=timezone.now() + WATERMARK_LAG)
+
+    def dish_sales(self) -> set:
+        return set(
+            DailyDishSales.objects.values_list(
+                "day", "dish_name", "quantity", "revenue"
+            )
+        )
+
+    def test_rollup_counts_sales_per_dish_and_status(self):
+        ArchivedOrder.objects.create(
+            id=self.second.pk + 100,
+            status=Order.Status.DELIVERED,
+            created_at=timezone.now() - timezone.timedelta(days=1),
+            updated_at=timezone.now(),
+            total_price=Decimal("15.00"),
+        )
+        ArchivedDishOrder.objects.create(
+            id=1,
+            order_id=self.second.pk + 100,
+            dish_name="Calzone",
+            dish_amount=1,
+            unit_price=Decimal("15.00"),
+        )
+
+        self.assertEqual(self.roll_up(), [self.yesterday, self.today])
+        self.assertEqual(
+            self.dish_sales(),
+            {
+                (self.yesterday, "Calzone", 1, Decimal("15.00")),
+                (self.yesterday, "Margherita", 2, Decimal("20.00")),
+                (self.yesterday, "Pepperoni", 1, Decimal("12.00")),
+                (self.today, "Margherita", 2, Decimal("20.00")),
+                (self.today, "Pepperoni", 1, Decimal("12.00")),
+            },
+        )
+        self.assertEqual(
+            set(
+                DailyStatusSales.objects.values_list(
+                    "day", "status", "orders", "revenue"
+                )
+            ),
+            {
+                (self.yesterday, "delivered", 2, Decimal("47.00")),
+                (self.today, "approved", 1, Decimal("32.00")),
+            },
+        )
+
+    def test_rollup_only_refreshes_days_of_changed_orders(self):
+        self.roll_up()
+        self.assertEqual(self.roll_up(), [])
+
+        Order.objects.filter(pk=self.second.pk).transition(
+            Order.Status.CANCELED
+        )
+        self.assertEqual(self.roll_up(), [self.today])
+
+        self.assertNotIn(
+            (self.today, "Margherita", 2, Decimal("20.00")), self.dish_sales()
+        )
+        self.assertEqual(
+            DailyStatusSales.objects.get(day=self.today).status, "canceled"
+        )
+        self.assertEqual(
+            DailyDishSales.objects.filter(day=self.yesterday).count(), 2
+        )
+
+    def test_rebuild_clears_days_without_orders(self):
+        self.roll_up()
+        Order.objects.filter(pk=self.first.pk).delete()
+
+        call_command("rollup_sales", "--rebuild", stdout=StringIO())
+
+        self.assertFalse(
+            DailyStatusSales.objects.filter(day=self.yesterday).exists()
+        )
+        self.assertEqual(rebuild_sales(), [self.today])
+
+    def test_dashboard_and_export_read_only_rollups(self):
+        self.roll_up()
+        self.client.force_login(
+            get_user_model().objects.create_user(
+                username="manager", is_staff=True
+            )
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("pizza_delivery:sales-dashboard")
+            )
+        export = self.client.get(
+            reverse("pizza_delivery:sales-export"),
+            {"date_from": self.yesterday, "date_to": self.today},
+        )
+
+        self.assertContains(response, "Margherita")
+        self.assertEqual(
+            response.context["top_dishes"][0],
+            {
+                "dish_name": "Margherita",
+                "quantity": 4,
+                "revenue": Decimal("40.00"),
+            },
+        )
+        self.assertFalse(
+            any(
+                Order._meta.db_table in query["sql"]
+                or DishOrder._meta.db_table in query["sql"]
+                for query in queries
+            )
+        )
+        self.assertEqual(
+            export.content.decode().splitlines()[1],
+            f"{self.yesterday},{self.margherita.pk},Margherita,2,20.00",
+        )
+
+    def test_dashboard_limits_the_range(self):
+        self.client.force_login(
+            get_user_model().objects.create_user(
+                username="manager", is_staff=True
+            )
+        )
+        response = self.client.get(
+            reverse("pizza_delivery:sales-export"),
+            {"date_from": "2024-01-01", "date_to": "2026-01-01"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        basil = Ingredient.objects.create(name="Basil")
+        for number in range(10):
+            dish = Dish.objects.create(
+                name=f"Pizza {number}", price=10 + number % 3, weight=500
+            )
+            DishIngredient.objects.create(
+                dish=dish, ingredient=basil, quantity=2
+            )
+        self.dish = Dish.objects.order_by("pk").first()
+        self.index_url = reverse("pizza_delivery:index")
+
+    def test_menu_pages_cost_no_queries_once_loaded(self):
+        self.client.get(self.index_url)
+
+        with self.assertNumQueries(0):
+            for sort in ("asc", "desc", "name"):
+                response = self.client.get(self.index_url, {"sort": sort})
+                self.client.get(
+                    self.index_url,
+                    {
+                        "sort": sort,
+                        "cursor": response.context["page_obj"].next_cursor,
+                    },
+                )
+            detail = self.client.get(self.dish.get_absolute_url())
+
+        self.assertContains(detail, "x2 Basil")
+
+    def test_saving_a_dish_refreshes_the_menu(self):
+        self.client.get(self.index_url)
+
+        self.dish.name = "Margherita"
+        self.dish.save()
+        detail = self.client.get(self.dish.get_absolute_url())
+        self.dish.delete()
+        missing = self.client.get(detail.request["PATH_INFO"])
+
+        self.assertContains(detail, "Margherita")
+        self.assertEqual(missing.status_code, 404)
+
+    def test_changes_from_other_workers_show_up_after_a_version_check(self):
+        self.client.get(self.index_url)
+        # Another worker's save: the row and the version change, but this
+        # worker's signal handlers don't run
+        Dish.objects.filter(pk=self.dish.pk).update(name="Margherita")
+        VersionCounter.objects.filter(name="menu").update(
+            value=F("value") + 1
+        )
+
+        stale = self.client.get(self.dish.get_absolute_url())
+        with mock.patch.object(catalog, "VERSION_CHECK_INTERVAL", 0):
+            fresh = self.client.get(self.dish.get_absolute_url())
+
+        self.assertNotContains(stale, "Margherita")
+        self.assertContains(fresh, "Margherita")
+
+    def test_unchanged_version_keeps_the_snapshot(self):
+        snapshot = catalog.get_menu()
+
+        with mock.patch.object(catalog, "VERSION_CHECK_INTERVAL", 0):
+            with self.assertNumQueries(1):
+                self.assertIs(catalog.get_menu(), snapshot)
+
+    def test_sequence_paginator_pages_like_queryset_paginator(self):
+        menu = catalog.get_menu()
+        for ordering in [("price", "pk"), ("-price", "-pk")]:
+            in_memory = SequenceCursorPaginator(
+                menu.ordered(ordering), 3, ordering
+            )
+            database = CursorPaginator(Dish.objects.all(), 3, ordering)
+            cursor = expected_cursor = None
+            for _ in range(4):
+                expected = database.page(expected_cursor)
+                page = in_memory.page(cursor)
+                self.assertEqual(
+                    [dish.pk for dish in page],
+                    [dish.pk for dish in expected],
+                )
+                self.assertEqual(page.number, expected.number)
+                # Signed with different salts, compare what cursors hold
+                for cursors, expected_cursors in [
+                    (page.next_cursors, expected.next_cursors),
+                    (page.previous_cursors, expected.previous_cursors),
+                ]:
+                    self.assertEqual(
+                        [
+                            signed and decode_cursor(signed, in_memory.salt)
+                            for signed in cursors
+                        ],
+                        [
+                            signed and decode_cursor(signed, database.salt)
+                            for signed in expected_cursors
+                        ],
+                    )
+                cursor = page.next_cursor
+                expected_cursor = expected.next_cursor
+
+    def test_sequence_and_queryset_cursors_are_not_interchangeable(self):
+        # Python and database collations order names differently
+        ordering = ("name", "pk")
+        in_memory = SequenceCursorPaginator(
+            catalog.get_menu().ordered(ordering), 3, ordering
+        )
+        database = CursorPaginator(Dish.objects.all(), 3, ordering)
+
+        self.assertEqual(
+            in_memory.page(database.page(None).next_cursor).number, 1
+        )
+        self.assertEqual(
+            database.page(in_memory.page(None).next_cursor).number, 1
+        )
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def compute(self, value="menu", delay=0.0):
+        def compute():
+            self.calls.append(value)
+            time.sleep(delay)
+            return value
+
+        return compute
+
+    def test_entries_are_shared_between_workers(self):
+        worker, other_worker = TieredCache(), TieredCache()
+
+        values = [
+            cache.get_or_set("menu", "dishes", 1, self.compute(), 60)
+            for cache in (worker, worker, other_worker)
+        ]
+
+        self.assertEqual(values, ["menu"] * 3)
+        self.assertEqual(self.calls, ["menu"])
+        self.assertEqual(
+            worker.stats()["menu"],
+            {
+                "local_hits": 1,
+                "shared_hits": 0,
+                "stale_hits": 0,
+                "misses": 1,
+                "hit_rate": 0.5,
+            },
+        )
+        self.assertEqual(other_worker.stats()["menu"]["shared_hits"], 1)
+
+    def test_newer_versions_miss_and_older_ones_hit(self):
+        cache = TieredCache()
+        cache.get_or_set("menu", "dishes", 2, self.compute("v2"), 60)
+
+        older = cache.get_or_set("menu", "dishes", 1, self.compute("v1"), 60)
+        newer = cache.get_or_set("menu", "dishes", 3, self.compute("v3"), 60)
+
+        self.assertEqual((older, newer), ("v2", "v3"))
+        self.assertEqual(self.calls, ["v2", "v3"])
+
+    def test_one_caller_rebuilds_a_missing_entry(self):
+        workers = [TieredCache(), TieredCache()]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            values = list(
+                executor.map(
+                    lambda number: workers[number % 2].get_or_set(
+                        "menu",
+                        "dishes",
+                        1,
+                        self.compute(delay=0.2),
+                        60,
+                    ),
+                    range(8),
+                )
+            )
+
+        self.assertEqual(values, ["menu"] * 8)
+        self.assertEqual(self.calls, ["menu"])
+
+    def test_stale_entry_is_served_while_another_worker_rebuilds(self):
+        cache = TieredCache()
+        cache.get_or_set(
+            "menu", "dishes", 1, self.compute("v1"), 60, stale_ttl=60
+        )
+        caches["default"].add(f"{make_key('menu', 'dishes')}:rebuild", 1)
+
+        stale = cache.get_or_set(
+            "menu", "dishes", 2, self.compute("v2"), 60, stale_ttl=60
+        )
+        caches["default"].delete(f"{make_key('menu', 'dishes')}:rebuild")
+        fresh = cache.get_or_set(
+            "menu", "dishes", 2, self.compute("v2"), 60, stale_ttl=60
+        )
+
+        self.assertEqual((stale, fresh), ("v1", "v2"))
+        self.assertEqual(cache.stats()["menu"]["stale_hits"], 1)
+
+    def test_local_entries_are_bounded(self):
+        cache = TieredCache(max_entries=2)
+        for key in ("a", "b", "a", "c"):
+            cache.get_or_set("menu", key, 1, self.compute(key), 60)
+
+        self.assertEqual(len(cache.local), 2)
+        self.assertIsNone(cache.local.get(make_key("menu", "b")))
+
+
+class CachedReadsTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Margherita", price=10, weight=500
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer"
+        )
+        self.index_url = reverse("pizza_delivery:index")
+
+    def test_cart_summary_is_cached_until_the_cart_changes(self):
+        cart = DatabaseCart(self.customer)
+        cart.add({self.dish.pk: 1})
+        cart.summary()
+
+        # Only the version row is read
+        with self.assertNumQueries(1):
+            cart.summary()
+        DatabaseCart(self.customer).add({self.dish.pk: 2})
+        summary = cart.summary()
+        DatabaseCart(self.customer).clear()
+
+        self.assertEqual(summary["order_items"][0]["dish_amount"], 3)
+        self.assertEqual(cart.summary()["order_items"], [])
+
+    def test_cart_changes_of_other_workers_invalidate_the_summary(self):
+        cart = DatabaseCart(self.customer)
+        cart.add({self.dish.pk: 1})
+        cart.summary()
+        # Another worker's change: the rows and the version row change,
+        # this worker's cache isn't told
+        DishOrder.objects.update(dish_amount=4)
+        VersionCounter.objects.filter(name=cart.version_name).update(
+            value=F("value") + 1
+        )
+
+        summary = cart.summary()
+
+        self.assertEqual(summary["order_items"][0]["dish_amount"], 4)
+
+    def test_search_pages_are_cached_per_menu_version(self):
+        self.client.get(self.index_url, {"query": "margherita"})
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.index_url, {"query": "margherita"})
+        self.dish.name = "Marinara"
+        self.dish.save()
+        renamed = self.client.get(self.index_url, {"query": "marinara"})
+        old_name = self.client.get(self.index_url, {"query": "margherita"})
+
+        self.assertContains(cached, "Margherita")
+        self.assertContains(renamed, "Marinara")
+        self.assertEqual(list(old_name.context["page_obj"]), [])
+
+    def test_stats_are_reported_to_staff_only(self):
+        stats_url = reverse("pizza_delivery:cache-stats")
+        self.client.get(self.index_url, {"query": "margherita"})
+        self.client.get(self.index_url, {"query": "margherita"})
+
+        anonymous = self.client.get(stats_url)
+        self.client.force_login(
+            get_user_model().objects.create_user(
+                username="manager", is_staff=True
+            )
+        )
+        stats = self.client.get(stats_url).json()
+
+        self.assertEqual(anonymous.status_code, 302)
+        self.assertEqual(stats["namespaces"]["page"]["hit_rate"], 0.5)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Margherita", price=10, weight=500
+        )
+        self.index_url = reverse("pizza_delivery:index")
+
+    def test_cards_are_rendered_once_per_dish_version(self):
+        self.client.get(self.index_url)
+        self.client.get(self.index_url, {"sort": "name"})
+        self.dish.price = 12
+        self.dish.save()
+        response = self.client.get(self.index_url)
+
+        self.assertContains(response, "12.00 USD")
+        self.assertEqual(
+            tiered_cache.stats()["dish-card"],
+            {
+                "local_hits": 1,
+                "shared_hits": 0,
+                "stale_hits": 0,
+                "misses": 2,
+                "hit_rate": 0.333,
+            },
+        )
+
+    def test_cached_cards_post_with_the_cookie_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.get(self.index_url)
+        response = client.get(self.index_url)
+
+        added = client.post(
+            reverse("pizza_delivery:batch-cart-operations"),
+            json.dumps(
+                {"operations": [{"dish_id": self.dish.pk, "delta": 1}]}
+            ),
+            content_type="application/json",
+            HTTP_X_CSRFTOKEN=client.cookies[settings.CSRF_COOKIE_NAME].value,
+        )
+
+        self.assertNotContains(response, "csrfmiddlewaretoken")
+        self.assertContains(added, "x1 Margherita")
+
+    def test_cart_sidebar_follows_the_cart_version(self):
+        add_url = reverse("pizza_delivery:add-remove-dish-button")
+        for client in (self.client, Client()):
+            client.post(
+                add_url, {"action": "add_one", "dish_id": self.dish.pk}
+            )
+        summary_url = reverse("pizza_delivery:cart-summary")
+
+        first = self.client.get(summary_url)
+        self.client.post(
+            add_url, {"action": "add_one", "dish_id": self.dish.pk}
+        )
+        second = self.client.get(summary_url)
+        self.client.get(reverse("pizza_delivery:clean-order"))
+        cleaned = self.client.get(summary_url)
+
+        self.assertContains(first, "x1 Margherita")
+        self.assertContains(second, "x2 Margherita")
+        self.assertNotContains(cleaned, "Margherita")
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(
+            name="Margherita", price=10, weight=500
+        )
+        self.index_url = reverse("pizza_delivery:index")
+        self.dish_url = self.dish.get_absolute_url()
+
+    def test_repeat_requests_get_not_modified_without_rendering(self):
+        first = self.client.get(self.index_url, {"sort": "desc"})
+
+        with self.assertNumQueries(0):
+            repeat = self.client.get(
+                self.index_url,
+                {"sort": "desc"},
+                HTTP_IF_NONE_MATCH=first["ETag"],
+            )
+
+        self.assertEqual(first.status_code, 200)
+        self.assertRegex(first["ETag"], r'^"[0-9a-f]{40}"$')
+        self.assertIn("private", first["Cache-Control"])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat["ETag"], first["ETag"])
+        self.assertFalse(repeat.templates)
+
+    def test_query_strings_are_normalized(self):
+        first = self.client.get(f"{self.index_url}?sort=desc&query=")
+        second = self.client.get(f"{self.index_url}?query=&sort=desc")
+        other = self.client.get(f"{self.index_url}?sort=name")
+
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertNotEqual(first["ETag"], other["ETag"])
+        self.assertEqual(tiered_cache.stats()["page"]["local_hits"], 1)
+
+    def test_menu_changes_change_the_etag(self):
+        first = self.client.get(self.index_url)
+        self.dish.name = "Marinara"
+        self.dish.save()
+
+        changed = self.client.get(
+            self.index_url, HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+        self.assertEqual(changed.status_code, 200)
+        self.assertContains(changed, "Marinara")
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_customers_and_filled_carts_bypass_the_cache(self):
+        anonymous = self.client.get(self.index_url)
+        self.client.post(
+            reverse("pizza_delivery:add-remove-dish-button"),
+            {"action": "add_one", "dish_id": self.dish.pk},
+        )
+        with_cart = self.client.get(
+            self.index_url, HTTP_IF_NONE_MATCH=anonymous["ETag"]
+        )
+        customer = Client()
+        customer.force_login(
+            get_user_model().objects.create_user(username="customer")
+        )
+        logged_in = customer.get(self.index_url)
+
+        self.assertNotIn("ETag", with_cart)
+        self.assertContains(with_cart, "x1 Margherita")
+        self.assertNotIn("ETag", logged_in)
+        self.assertIn(settings.CSRF_COOKIE_NAME, logged_in.cookies)
+
+    def test_dish_pages_are_validated_by_the_dish_update_time(self):
+        # Last-Modified has a resolution of seconds
+        Dish.objects.filter(pk=self.dish.pk).update(
+            updated_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+        first = self.client.get(self.dish_url)
+        not_modified = self.client.get(
+            self.dish_url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+        )
+        DishIngredient.objects.create(
+            dish=self.dish, ingredient=Ingredient.objects.create(name="Basil")
+        )
+        self.dish.refresh_from_db()
+        changed = self.client.get(
+            self.dish_url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+        )
+
+        self.assertEqual(
+            first["Last-Modified"],
+            http_date(int(first.context["dish"].updated_at.timestamp())),
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(changed.status_code, 200)
+        self.assertContains(changed, "Basil")
+        self.assertEqual(
+            changed["Last-Modified"],
+            http_date(int(self.dish.updated_at.timestamp())),
+        )
+
+    def test_dish_deleted_while_rendering_its_page_is_not_an_error(self):
+        rendered_from = catalog.get_menu()
+        self.dish.delete()
+        with mock.patch.object(catalog, "VERSION_CHECK_INTERVAL", 0):
+            current = catalog.get_menu()
+
+        with mock.patch(
+            "pizza_delivery.views.get_menu",
+            side_effect=[rendered_from, current],
+        ):
+            response = self.client.get(self.dish_url)
+
+        self.assertNotIn(self.dish.pk, current.dishes)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+
+    def test_error_pages_are_not_cached(self):
+        missing_url = reverse("pizza_delivery:dish-detail", args=[0])
+
+        responses = [self.client.get(missing_url) for _ in range(2)]
+
+        self.assertEqual(
+            [response.status_code for response in responses], [404, 404]
+        )
+        self.assertEqual(tiered_cache.stats()["page"]["misses"], 2)
+
+    def test_static_pages_are_cached(self):
+        first = self.client.get(reverse("pizza_delivery:about-us"))
+        repeat = self.client.get(
+            reverse("pizza_delivery:about-us"),
+            HTTP_IF_NONE_MATCH=first["ETag"],
+        )
+
+        self.assertEqual(repeat.status_code, 304)
+
+
+class DishCardsTests(TestCase):
+    def setUp(self):
+        for number in range(1, 14):
+            Dish.objects.create(
+                name=f"Pizza {number:02}", price=number, weight=500
+            )
+        self.cards_url = reverse("pizza_delivery:dish-cards")
+
+    @staticmethod
+    def next_url(response) -> str | None:
+        match = re.search(r'data-url="([^"]+)"', response.content.decode())
+        return match and match.group(1).replace("&amp;", "&")
+
+    def test_slices_follow_the_index_pages(self):
+        index = self.client.get(reverse("pizza_delivery:index"))
+        url = self.next_url(index)
+        names = [dish.name for dish in index.context["dishes_list"]]
+        while url:
+            response = self.client.get(url)
+            names += [dish.name for dish in response.context["dishes_list"]]
+            url = self.next_url(response)
+
+        self.assertTrue(
+            self.next_url(index).startswith(f"{self.cards_url}?")
+        )
+        self.assertEqual(
+            names, [f"Pizza {number:02}" for number in range(1, 14)]
+        )
+
+    def test_slices_keep_the_search_and_sort(self):
+        first = self.client.get(
+            self.cards_url, {"query": "pizza", "sort": "desc"}
+        )
+        second = self.client.get(self.next_url(first))
+
+        self.assertIn("query=pizza", self.next_url(first))
+        self.assertEqual(
+            [dish.name for dish in second.context["dishes_list"]],
+            [f"Pizza {number:02}" for number in range(7, 1, -1)],
+        )
+
+    def test_slice_is_a_bare_fragment_without_the_cart(self):
+        self.client.force_login(
+            get_user_model().objects.create_user(username="customer")
+        )
+        self.client.post(
+            reverse("pizza_delivery:add-remove-dish-button"),
+            {"action": "add_one", "dish_id": Dish.objects.first().pk},
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.cards_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "<html")
+        self.assertNotIn(
+            "includes/cart_summary.html",
+            [template.name for template in response.templates],
+        )
+        self.assertFalse(
+            [
+                query["sql"]
+                for query in queries.captured_queries
+                if "pizza_delivery_order" in query["sql"]
+                or "pizza_delivery_dishorder" in query["sql"]
+            ]
+        )
+        # Six cards and the link to the next ones
+        self.assertLess(len(response.content), 8 * 1024)
+
+    def test_anonymous_slices_are_cached(self):
+        first = self.client.get(self.cards_url)
+        repeat = self.client.get(
+            self.cards_url, HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(
+            self.client.post(self.cards_url).status_code, 400
+        )
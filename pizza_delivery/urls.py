@@ -2,6 +2,7 @@ from django.urls import path
 
 from pizza_delivery.views import (
     index,
+    dish_cards,
     about_us,
     contact_us,
     UserLoginView,
@@ -9,8 +10,14 @@ from pizza_delivery.views import (
     logout_view,
     DishDetailView,
     add_remove_dish_button,
+    batch_cart_operations,
+    cart_summary,
     order_complete,
     clean_order,
+    order_export,
+    sales_dashboard,
+    sales_export,
+    cache_stats,
     CustomerUpdateView,
     UserPasswordChangeView,
 )
@@ -20,13 +27,24 @@ urlpatterns = [
     path("", index, name="index"),
     path("profile/<int:pk>/", CustomerUpdateView.as_view(), name="profile"),
     path("dishes/<int:pk>/", DishDetailView.as_view(), name="dish-detail"),
+    path("dishes/cards/", dish_cards, name="dish-cards"),
     path(
         "order/add_remove_dish/",
         add_remove_dish_button,
         name="add-remove-dish-button",
     ),
+    path(
+        "order/batch/",
+        batch_cart_operations,
+        name="batch-cart-operations",
+    ),
+    path("order/summary/", cart_summary, name="cart-summary"),
     path("order/clean/", clean_order, name="clean-order"),
     path("order_complete/", order_complete, name="order-complete"),
+    path("orders/export/", order_export, name="order-export"),
+    path("sales/", sales_dashboard, name="sales-dashboard"),
+    path("sales/export/", sales_export, name="sales-export"),
+    path("cache/stats/", cache_stats, name="cache-stats"),
     # Top Bar
     path("about-us/", about_us, name="about-us"),
     path("contact-us/", contact_us, name="contact-us"),
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from pizza_delivery.models import VersionCounter
+
+MENU_VERSION = "menu"
+
+
+def current_version(name: str) -> int:
+    return (
+        VersionCounter.objects.filter(name=name)
+        .values_list("value", flat=True)
+        .first()
+    ) or 0
+
+
+def version_changed_at(name: str) -> tuple[int, datetime]:
+    """Current version of ``name`` and when it was last bumped."""
+    return VersionCounter.objects.filter(name=name).values_list(
+        "value", "changed_at"
+    ).first() or (0, timezone.now())
+
+
+def bump_version(name: str) -> None:
+    # The row lock is held until commit, concurrent bumps queue up and
+    # every one of them counts
+    changes = {"value": F("value") + 1, "changed_at": timezone.now()}
+    if VersionCounter.objects.filter(name=name).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            VersionCounter.objects.create(name=name, value=1)
+    except IntegrityError:
+        VersionCounter.objects.filter(name=name).update(**changes)
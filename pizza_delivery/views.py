@@ -1,22 +1,38 @@
+import csv
+import json
+import os
+from datetime import datetime
+
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView, PasswordChangeView
 from django.core.exceptions import PermissionDenied
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db import transaction
-from django.db.models import Q
 from django.http import (
+    Http404,
     HttpResponse,
     HttpResponseBadRequest,
     HttpRequest,
-    HttpResponseRedirect
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
 )
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views import generic
 
+from pizza_delivery.caching import tiered_cache
+from pizza_delivery.catalog import get_menu, search_menu
+from pizza_delivery.cart import (
+    MAX_BATCH_OPERATIONS,
+    CartBusy,
+    InvalidCartOperation,
+    apply_cart_operations,
+    get_cart,
+)
 from pizza_delivery.forms import (
     RegistrationForm,
     UserLoginForm,
@@ -24,44 +40,75 @@ from pizza_delivery.forms import (
     DishSearchForm,
     UserPasswordChangeForm,
     OrderUpdateForm,
+    OrderExportForm,
+    SalesReportForm,
+)
+from pizza_delivery.models import Customer, Dish
+from pizza_delivery.order_export import (
+    csv_chunks,
+    export_orders,
+    ndjson_chunks,
 )
-from pizza_delivery.models import Customer, Dish, Order, DishOrder
-from pizza_delivery.utils import (
-    get_user_orders,
-    get_orders_for_customer_or_session,
+from pizza_delivery.page_cache import cache_anonymous_page
+from pizza_delivery.pagination import CursorPage
+from pizza_delivery.rollups import (
+    daily_dish_sales,
+    sales_by_dish,
+    sales_by_status,
+    status_report,
 )
+from pizza_delivery.utils import get_user_orders
 
+DISHES_PER_PAGE = 6
+# Every ordering ends with the primary key so cursors are unambiguous
+SORT_ORDERINGS = {
+    "asc": ("price", "pk"),
+    "desc": ("-price", "-pk"),
+}
+NAME_ORDERING = ("name", "pk")
+RELEVANCE_ORDERING = ("-search_rank", "pk")
+TOP_DISHES = 20
 
-def index(request) -> HttpResponse | HttpResponseBadRequest:
-    if request.method == "POST":
-        return HttpResponseBadRequest("Method not allowed")
 
-    orders_info = get_user_orders(request)
+def menu_changed_at(request: HttpRequest) -> datetime:
+    return get_menu().changed_at
+
+
+def dish_updated_at(request: HttpRequest, pk: int) -> datetime | None:
+    # A dish deleted since the page was rendered falls back to the time
+    # of rendering
+    dish = get_menu().dishes.get(pk)
+    return dish.updated_at if dish else None
+
 
+def menu_page(request: HttpRequest) -> tuple[CursorPage, str, str]:
+    """Page of dishes for the search, sort and cursor of the request."""
     query = request.GET.get("query", "")
-    sort_order = request.GET.get("sort", "asc")
+    # Search results keep their relevance order unless a sort was asked for
+    sort_order = request.GET.get("sort", "" if query else "asc")
 
-    dishes = Dish.objects.prefetch_related("dish_orders").order_by("name")
+    ordering = SORT_ORDERINGS.get(sort_order, NAME_ORDERING)
 
+    cursor = request.GET.get("cursor")
     if query:
-        dishes = dishes.filter(
-            Q(name__icontains=query) | Q(ingredients__name__icontains=query)
-        ).distinct()
+        if sort_order not in SORT_ORDERINGS:
+            ordering = RELEVANCE_ORDERING
+        dishes = search_menu(query, ordering, cursor, DISHES_PER_PAGE)
+    else:
+        # Plain listing is served from the in-process menu snapshot
+        dishes = get_menu().paginator(ordering, DISHES_PER_PAGE).page(cursor)
+    return dishes, query, sort_order
 
-    if sort_order == "asc":
-        dishes = dishes.order_by("price")
-    elif sort_order == "desc":
-        dishes = dishes.order_by("-price")
 
-    paginator = Paginator(dishes, 6)
-    page_number = request.GET.get("page")
+# Cached pages carry no CSRF token, the AJAX code reads it from the cookie
+@ensure_csrf_cookie
+@cache_anonymous_page(last_modified=menu_changed_at)
+def index(request) -> HttpResponse | HttpResponseBadRequest:
+    if request.method == "POST":
+        return HttpResponseBadRequest("Method not allowed")
 
-    try:
-        dishes = paginator.page(page_number)
-    except PageNotAnInteger:
-        dishes = paginator.page(1)
-    except EmptyPage:
-        dishes = paginator.page(paginator.num_pages)
+    orders_info = get_user_orders(request)
+    dishes, query, sort_order = menu_page(request)
 
     context = {
         "dishes_list": dishes,
@@ -75,6 +122,20 @@ def index(request) -> HttpResponse | HttpResponseBadRequest:
     return render(request, "pages/index.html", context=context)
 
 
+@cache_anonymous_page(last_modified=menu_changed_at)
+def dish_cards(request: HttpRequest) -> (
+        HttpResponse | HttpResponseBadRequest
+):
+    # Next slice of the index grid for infinite scroll, without the page
+    # around it and the cart
+    if request.method != "GET":
+        return HttpResponseBadRequest("Invalid request method")
+
+    dishes, _, _ = menu_page(request)
+    context = {"dishes_list": dishes, "page_obj": dishes}
+    return render(request, "includes/dish_cards_page.html", context=context)
+
+
 def add_remove_dish_button(request) -> (
         HttpResponse | HttpResponseBadRequest
 ):
@@ -86,106 +147,97 @@ def add_remove_dish_button(request) -> (
     except Dish.DoesNotExist:
         return HttpResponseBadRequest("Dish does not exist")
 
-    customer = request.user
-    session_key = request.session.session_key
-
-    if not session_key:
-        request.session.create()
-        session_key = request.session.session_key
-
     action = request.POST.get("action")
-    created_order_list = get_orders_for_customer_or_session(request)
-
-    if action == "add_one":
-        dish_added = False
-
-        for order in created_order_list:
-            try:
-                dish_order = DishOrder.objects.get(order=order, dish=new_dish)
-                dish_order.dish_amount += 1
-                dish_order.save()
-                dish_added = True
-                return HttpResponse(
-                    "Dish added to an existing order successfully", status=200
-                )
-            except DishOrder.DoesNotExist:
-                continue
-
-        if not dish_added:
-            with transaction.atomic():
-                order = Order.objects.create(
-                    status=Order.Status.CREATED,
-                    customer=customer if customer.is_authenticated else None,
-                    session_key=(
-                        session_key if not customer.is_authenticated else None
-                    ),
-                    asked_date_delivery=timezone.now(),
-                    name="",
-                    phone_number="",
-                    email="",
-                    address="",
-                )
-                DishOrder.objects.create(
-                    order=order, dish=new_dish, dish_amount=1
-                )
-                return HttpResponse(
-                    "Dish added to a new order successfully", status=201
-                )
-
-    elif action == "remove_one":
-        for order in created_order_list:
-            try:
-                dish_order = DishOrder.objects.get(order=order, dish=new_dish)
-                if dish_order.dish_amount > 1:
-                    dish_order.dish_amount -= 1
-                    dish_order.save()
-                    return HttpResponse(
-                        "One dish removed from an existing order successfully",
-                        status=200,
-                    )
-                else:
-                    with transaction.atomic():
-                        dish_order.delete()
-                        if not DishOrder.objects.filter(order=order).exists():
-                            order.delete()
-                    return HttpResponse(
-                        "Dish completely removed from "
-                        "an existing order successfully",
-                        status=200,
-                    )
-            except DishOrder.DoesNotExist:
-                continue
+    # No session yet means an empty cart, the session middleware saves
+    # one only once the cart actually changes
+    cart = get_cart(request)
+
+    try:
+        if action == "add_one":
+            created = cart.add({new_dish.pk: 1}, {new_dish.pk: new_dish})
+            return render_cart_summary(
+                request, status=201 if created else 200
+            )
+
+        elif action == "remove_one":
+            if cart.remove({new_dish.pk: 1}):
+                return render_cart_summary(request)
+    except CartBusy as error:
+        return HttpResponse(str(error), status=409)
 
     return HttpResponseBadRequest("Invalid action")
 
 
-def order_complete(request: HttpRequest) -> (HttpResponse | HttpResponseRedirect):
+def batch_cart_operations(request: HttpRequest) -> (
+        HttpResponse | HttpResponseBadRequest
+):
+    if request.method != "POST":
+        return HttpResponseBadRequest("Invalid request method")
+
+    try:
+        operations = [
+            (int(operation["dish_id"]), int(operation["delta"]))
+            for operation in json.loads(request.body)["operations"]
+        ]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest("Invalid operations")
+
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return HttpResponseBadRequest("Too many operations")
+
+    try:
+        apply_cart_operations(get_cart(request), operations)
+    except InvalidCartOperation as error:
+        return HttpResponseBadRequest(str(error))
+    except CartBusy as error:
+        return HttpResponse(str(error), status=409)
+
+    return render_cart_summary(request)
+
+
+def cart_summary(request: HttpRequest) -> (
+        HttpResponse | HttpResponseBadRequest
+):
+    if request.method != "GET":
+        return HttpResponseBadRequest("Invalid request method")
+
+    return render_cart_summary(request)
+
+
+def render_cart_summary(request: HttpRequest, status: int = 200) -> (
+        HttpResponse
+):
     orders_info = get_user_orders(request)
-    customer = request.user
+    context = {
+        "order_list": orders_info["order_items"],
+        "total_price": orders_info["total_price"],
+    }
+    return render(
+        request, "includes/cart_summary.html", context=context, status=status
+    )
 
-    orders = get_orders_for_customer_or_session(request)
+
+def order_complete(request: HttpRequest) -> (HttpResponse | HttpResponseRedirect):
+    cart = get_cart(request)
+    customer = request.user
 
     if request.method == "POST":
         form = OrderUpdateForm(request.POST, customer=customer)
         if not form.is_valid():
             raise ValueError("Form data is not valid")
 
-        for order in orders:
-            for field, value in form.cleaned_data.items():
-                setattr(order, field, value)
-            order.status = Order.Status.APPROVED
-            order.save()
-
-        messages.success(
-            request,
-            "Order approved successfully. Operator will contact you soon.",
-        )
+        # A repeated submit finds nothing left to approve
+        if cart.checkout(form.cleaned_data) is not None:
+            messages.success(
+                request,
+                "Order approved successfully. Operator will contact you soon.",
+            )
         return redirect("pizza_delivery:index")
 
-    elif not orders:
+    orders_info = cart.summary()
+    if not orders_info["order_items"]:
         return redirect("pizza_delivery:index")
-    else:
-        form = OrderUpdateForm(customer=customer)
+    form = OrderUpdateForm(customer=customer)
 
     context = {
         "form": form,
@@ -198,16 +250,112 @@ def order_complete(request: HttpRequest) -> (HttpResponse | HttpResponseRedirect
 
 
 def clean_order(request: HttpRequest) -> HttpResponseRedirect:
-    orders = get_orders_for_customer_or_session(request)
-    for order in orders:
-        order.delete()
+    get_cart(request).clear()
     return redirect("pizza_delivery:index")
 
 
+@staff_member_required
+def order_export(request: HttpRequest) -> (
+        StreamingHttpResponse | HttpResponseBadRequest
+):
+    form = OrderExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    # The generator runs while the response is sent, rows go out as they
+    # are read instead of after the whole export is built
+    records = export_orders(form.filters())
+    if form.cleaned_data["format"] == "ndjson":
+        response = StreamingHttpResponse(
+            ndjson_chunks(records), content_type="application/x-ndjson"
+        )
+        extension = "ndjson"
+    else:
+        response = StreamingHttpResponse(
+            csv_chunks(records), content_type="text/csv"
+        )
+        extension = "csv"
+    response["Content-Disposition"] = (
+        f'attachment; filename="orders.{extension}"'
+    )
+    return response
+
+
+@staff_member_required
+def sales_dashboard(request: HttpRequest) -> HttpResponse:
+    # Reads the daily rollups only, never the orders themselves
+    form = SalesReportForm(request.GET)
+    context = {"form": form}
+    if form.is_valid():
+        date_from = form.cleaned_data["date_from"]
+        date_to = form.cleaned_data["date_to"]
+        context.update(
+            date_from=date_from,
+            date_to=date_to,
+            report=status_report(date_from, date_to),
+            top_dishes=sales_by_dish(date_from, date_to)[:TOP_DISHES],
+        )
+    return render(request, "pages/sales_dashboard.html", context=context)
+
+
+@staff_member_required
+def sales_export(request: HttpRequest) -> (
+        HttpResponse | HttpResponseBadRequest
+):
+    form = SalesReportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    date_from = form.cleaned_data["date_from"]
+    date_to = form.cleaned_data["date_to"]
+    response = HttpResponse(content_type="text/csv")
+    writer = csv.writer(response)
+    if request.GET.get("kind") == "statuses":
+        writer.writerow(["day", "status", "orders", "revenue"])
+        writer.writerows(
+            sales_by_status(date_from, date_to).values_list(
+                "day", "status", "orders", "revenue"
+            )
+        )
+        name = "sales-by-status"
+    else:
+        writer.writerow(["day", "dish_id", "dish_name", "quantity", "revenue"])
+        writer.writerows(
+            daily_dish_sales(date_from, date_to).values_list(
+                "day", "dish_id", "dish_name", "quantity", "revenue"
+            )
+        )
+        name = "sales-by-dish"
+    response["Content-Disposition"] = (
+        f'attachment; filename="{name}-{date_from}-{date_to}.csv"'
+    )
+    return response
+
+
+@staff_member_required
+def cache_stats(request: HttpRequest) -> JsonResponse:
+    # Counters are per worker, the pid tells the workers' reports apart
+    return JsonResponse(
+        {
+            "pid": os.getpid(),
+            "local_entries": len(tiered_cache.local),
+            "namespaces": tiered_cache.stats(),
+        }
+    )
+
+
+@method_decorator(
+    cache_anonymous_page(last_modified=dish_updated_at), name="dispatch"
+)
 class DishDetailView(generic.DetailView):
-    model = Dish
-    queryset = Dish.objects.prefetch_related("orders")
     template_name = "pages/dish_detail.html"
+    context_object_name = "dish"
+
+    def get_object(self, queryset=None):
+        dish = get_menu().dishes.get(self.kwargs["pk"])
+        if dish is None:
+            raise Http404("No dish found matching the query")
+        return dish
 
 
 class CustomerUpdateView(LoginRequiredMixin, generic.UpdateView):
@@ -228,10 +376,12 @@ class CustomerUpdateView(LoginRequiredMixin, generic.UpdateView):
         )
 
 
+@cache_anonymous_page()
 def about_us(request: HttpRequest) -> HttpResponse:
     return render(request, "pages/about-us.html")
 
 
+@cache_anonymous_page()
 def contact_us(request: HttpRequest) -> HttpResponse:
     return render(request, "pages/contact-us.html")
 
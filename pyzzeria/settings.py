@@ -23,6 +23,8 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # Operator classes of the admin search indexes
+    "django.contrib.postgres",
 
     "debug_toolbar",
     "bootstrap5",
@@ -122,6 +124,27 @@ AUTH_USER_MODEL = "pizza_delivery.Customer"
 
 LOGIN_REDIRECT_URL = "/"
 
+# CACHES
+# Shared by all workers behind the per-worker memory cache, e.g.
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache with
+# CACHE_LOCATION=127.0.0.1:11211, or the file based cache on one host
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="pyzzeria"),
+    }
+}
+
+# SESSIONS
+# Anonymous carts live in the session, e.g. "cached_db" or
+# "signed_cookies" keep them off the database
+SESSION_ENGINE = config(
+    "SESSION_ENGINE", default="django.contrib.sessions.backends.db"
+)
+
 
 # DEBUG-TOOLBAR
 INTERNAL_IPS = [